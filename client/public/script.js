@@ -317,6 +317,11 @@ async function screenshotAndMove(command, args = []) {
         reasoning: model_response.reasoning,
         timestamp: new Date().toISOString(),
         userPrompt: userPrompt,
+        adherence: model_response.adherence,
+        board: model_response.board,
+        // The frame /api/analyze OCR'd and decided on
+        screenshot: model_response.screenshot,
+        embeddingLine: model_response.embeddingLine,
       }),
     });
 
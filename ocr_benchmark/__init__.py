@@ -0,0 +1,7 @@
+"""
+Offline throughput and accuracy benchmark for the OCR pipeline in ocr_server/ocr_api.py.
+- renderer: draws synthetic 2048 screenshots with known boards
+- runner: times each pipeline stage over generated frames
+- report: summarizes latency percentiles, frames per second and tile accuracy
+Run with `python -m ocr_benchmark --help` from the repository root.
+"""
@@ -0,0 +1,42 @@
+# Import necessary libraries
+import argparse
+import sys
+
+from .renderer import RESOLUTIONS, THEMES, generate_frames
+from .report import format_report, summarize, write_json
+from .runner import ENCODINGS, ocr_api, run_benchmark
+
+
+def main(argv=None) -> int:
+    """Renders synthetic boards, runs the OCR pipeline over them and prints the report."""
+    parser = argparse.ArgumentParser(prog="python -m ocr_benchmark",
+                                     description="Benchmark OCR latency and accuracy on synthetic 2048 boards.")
+    parser.add_argument("--frames", type=int, default=1000, help="number of frames to render (default 1000)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=ocr_api.OCR_ENGINES, default=ocr_api.OCR_ENGINE)
+    parser.add_argument("--preprocess", choices=ocr_api.PREPROCESS_MODES, default=ocr_api.PREPROCESS_MODE)
+    parser.add_argument("--encoding", choices=ENCODINGS, default="png", help="upload format to decode")
+    parser.add_argument("--theme", action="append", choices=list(THEMES), help="restrict themes (repeatable)")
+    parser.add_argument("--resolution", action="append", metavar="WxH",
+                        help="restrict resolutions, e.g. 1080x2400 (repeatable)")
+    parser.add_argument("--max-noise", type=float, default=4.0, help="max Gaussian noise std dev")
+    parser.add_argument("--cache", action="store_true", help="enable the tile recognition cache")
+    parser.add_argument("--cached-geometry", action="store_true",
+                        help="reuse cached board geometry instead of detecting on every frame")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    resolutions = [tuple(int(n) for n in r.lower().split("x")) for r in args.resolution] if args.resolution \
+        else RESOLUTIONS
+    frames = generate_frames(args.frames, args.seed, args.theme, resolutions, (0.0, args.max_noise))
+    results = run_benchmark(frames, args.engine, args.preprocess, args.encoding, args.cache,
+                            redetect=not args.cached_geometry)
+    summary = summarize(results)
+    print(format_report(summary))
+    if args.json:
+        write_json(summary, args.json)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
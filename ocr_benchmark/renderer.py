@@ -0,0 +1,126 @@
+# Import necessary libraries
+import cv2
+import numpy as np
+
+# Screen resolutions (width, height) of the phones and emulators we collect from
+RESOLUTIONS = [(720, 1600), (1080, 1920), (1080, 2400), (1440, 3040)]
+
+# Colors are RGB; tiles missing from a theme's palette use its "high" color
+THEMES = {
+    "classic": {
+        "background": (250, 248, 239),
+        "board": (187, 173, 160),
+        "dark_text": (119, 110, 101),
+        "light_text": (249, 246, 242),
+        "high": (60, 58, 50),
+        "tiles": {
+            0: (205, 193, 180), 2: (238, 228, 218), 4: (237, 224, 200), 8: (242, 177, 121),
+            16: (245, 149, 99), 32: (246, 124, 95), 64: (246, 94, 59), 128: (237, 207, 114),
+            256: (237, 204, 97), 512: (237, 200, 80), 1024: (237, 197, 63), 2048: (237, 194, 46),
+        },
+    },
+    "dark": {
+        "background": (28, 28, 30),
+        "board": (58, 56, 52),
+        "dark_text": (235, 232, 225),
+        "light_text": (249, 246, 242),
+        "high": (20, 20, 20),
+        "tiles": {
+            0: (80, 76, 70), 2: (120, 112, 104), 4: (128, 116, 96), 8: (178, 118, 64),
+            16: (190, 96, 50), 32: (196, 76, 48), 64: (200, 56, 30), 128: (186, 158, 60),
+            256: (186, 152, 48), 512: (186, 148, 36), 1024: (186, 144, 24), 2048: (186, 140, 12),
+        },
+    },
+}
+
+
+def random_board(rng: np.random.Generator, max_exponent: int = 11) -> np.ndarray:
+    """
+    Draws a plausible mid-game board: about a third of the cells empty, and small
+    values far more common than large ones (geometric distribution over log2 values).
+    """
+    exponents = np.minimum(rng.geometric(0.35, size=16), max_exponent)
+    exponents[rng.random(16) < 0.35] = 0
+    return np.where(exponents > 0, 2 ** exponents, 0).reshape(4, 4)
+
+
+def _bgr(rgb: tuple) -> tuple:
+    return rgb[2], rgb[1], rgb[0]
+
+
+def _draw_centered_text(img: np.ndarray, text: str, box: tuple, color: tuple):
+    """Draws bold text centered in box=(x, y, size), shrinking the font for longer numbers."""
+    x, y, size = box
+    thickness = max(2, size // 28)
+    scale = cv2.getFontScaleFromHeight(cv2.FONT_HERSHEY_SIMPLEX, int(size * 0.42), thickness)
+    (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    if tw > size * 0.8:
+        scale *= size * 0.8 / tw
+        (tw, th), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+    origin = (x + (size - tw) // 2, y + (size + th) // 2)
+    cv2.putText(img, text, origin, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness, cv2.LINE_AA)
+
+
+def render_board(board: np.ndarray, resolution: tuple = (1080, 1920), theme: str = "classic",
+                 rng: np.random.Generator = None, noise: float = 0.0, jpeg_quality: int = None) -> np.ndarray:
+    """
+    Renders a full-screen 2048 screenshot (BGR) for a 4x4 board of tile values.
+    - Places the board horizontally centered with a little vertical jitter, plus a header with score boxes
+    - `noise` adds Gaussian pixel noise with that standard deviation
+    - `jpeg_quality` round-trips the frame through JPEG to add compression artifacts
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    palette = THEMES[theme]
+    width, height = resolution
+    img = np.empty((height, width, 3), dtype=np.uint8)
+    img[:] = _bgr(palette["background"])
+
+    board_size = int(width * rng.uniform(0.86, 0.92))
+    gap = board_size // 36
+    tile = (board_size - 5 * gap) // 4
+    board_size = 4 * tile + 5 * gap
+    x0 = (width - board_size) // 2
+    y0 = int(height * rng.uniform(0.3, 0.4))
+
+    # Header: title and two score boxes, which detection has to ignore
+    box_w, box_h = width // 5, width // 9
+    for bx in (width - 2 * box_w - 3 * gap, width - box_w - gap):
+        cv2.rectangle(img, (bx, y0 - box_h - 4 * gap), (bx + box_w, y0 - 4 * gap), _bgr(palette["board"]), -1)
+    _draw_centered_text(img, "2048", (x0, y0 - box_h - 6 * gap, box_h), _bgr(palette["dark_text"]))
+
+    cv2.rectangle(img, (x0, y0), (x0 + board_size, y0 + board_size), _bgr(palette["board"]), -1)
+    for r in range(4):
+        for c in range(4):
+            value = int(board[r, c])
+            x = x0 + gap + c * (tile + gap)
+            y = y0 + gap + r * (tile + gap)
+            color = palette["tiles"].get(value, palette["high"])
+            cv2.rectangle(img, (x, y), (x + tile, y + tile), _bgr(color), -1)
+            if value:
+                text_color = palette["dark_text"] if value <= 4 else palette["light_text"]
+                _draw_centered_text(img, str(value), (x, y, tile), _bgr(text_color))
+
+    if noise:
+        img = np.clip(img + rng.normal(0, noise, img.shape), 0, 255).astype(np.uint8)
+    if jpeg_quality:
+        encoded = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])[1]
+        img = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+    return img
+
+
+def generate_frames(count: int, seed: int = 0, themes: list = None, resolutions: list = None,
+                    noise: tuple = (0.0, 4.0), jpeg_qualities: tuple = (None, 95, 80, 60)):
+    """
+    Yields `count` (frame, board) pairs with randomized theme, resolution, noise level
+    and JPEG quality. The same seed always produces the same frames.
+    """
+    rng = np.random.default_rng(seed)
+    themes = themes or list(THEMES)
+    resolutions = resolutions or RESOLUTIONS
+    for _ in range(count):
+        board = random_board(rng)
+        theme = themes[rng.integers(len(themes))]
+        resolution = resolutions[rng.integers(len(resolutions))]
+        quality = jpeg_qualities[rng.integers(len(jpeg_qualities))]
+        frame = render_board(board, resolution, theme, rng, rng.uniform(*noise), quality)
+        yield frame, board
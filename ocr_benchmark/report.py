@@ -0,0 +1,76 @@
+# Import necessary libraries
+import json
+
+import numpy as np
+
+PERCENTILES = (50, 95, 99)
+
+
+def latency_summary(samples: list) -> dict:
+    """Returns mean and p50/p95/p99 of a list of millisecond timings."""
+    if not samples:
+        return {"mean": None, **{f"p{p}": None for p in PERCENTILES}}
+    arr = np.asarray(samples)
+    summary = {"mean": round(float(arr.mean()), 3)}
+    for p, value in zip(PERCENTILES, np.percentile(arr, PERCENTILES)):
+        summary[f"p{p}"] = round(float(value), 3)
+    return summary
+
+
+def summarize(results: dict) -> dict:
+    """
+    Reduces raw runner results to the benchmark report:
+    per-stage latency percentiles, frames per second, and tile/board accuracy.
+    """
+    total_ms = sum(results["total"])
+    tiles_correct = sum(correct for correct, _ in results["tiles"].values())
+    tiles_seen = sum(seen for _, seen in results["tiles"].values())
+    processed = len(results["total"])
+    return {
+        "config": {key: results[key] for key in ("engine", "preprocess", "encoding", "use_cache")},
+        "frames": results["frames"],
+        "failed_frames": sum(results["errors"].values()),
+        "errors": results["errors"],
+        "fps": round(processed / (total_ms / 1000), 2) if total_ms else 0.0,
+        "latency_ms": {
+            **{stage: latency_summary(samples) for stage, samples in results["stages"].items()},
+            "total": latency_summary(results["total"]),
+        },
+        "tile_accuracy": round(tiles_correct / tiles_seen, 4) if tiles_seen else 0.0,
+        "board_accuracy": round(results["boards_correct"] / processed, 4) if processed else 0.0,
+        "tile_accuracy_by_value": {
+            str(value): round(correct / seen, 4)
+            for value, (correct, seen) in sorted(results["tiles"].items())
+        },
+    }
+
+
+def format_report(summary: dict) -> str:
+    """Formats a summary as a plain-text table for the terminal."""
+    config = summary["config"]
+    lines = [
+        f"engine={config['engine']} preprocess={config['preprocess']} "
+        f"encoding={config['encoding']} cache={config['use_cache']}",
+        f"frames: {summary['frames']} ({summary['failed_frames']} failed), {summary['fps']} fps",
+        "",
+        f"{'stage':<12}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}   (ms)",
+    ]
+    for stage, stats in summary["latency_ms"].items():
+        cells = "".join(f"{stats[k]:>10.2f}" if stats[k] is not None else f"{'-':>10}"
+                        for k in ("mean", "p50", "p95", "p99"))
+        lines.append(f"{stage:<12}{cells}")
+    lines += [
+        "",
+        f"tile accuracy:  {summary['tile_accuracy']:.2%}",
+        f"board accuracy: {summary['board_accuracy']:.2%}",
+        "by value: " + ", ".join(f"{v}={a:.0%}" for v, a in summary["tile_accuracy_by_value"].items()),
+    ]
+    for message, count in summary["errors"].items():
+        lines.append(f"error x{count}: {message}")
+    return "\n".join(lines)
+
+
+def write_json(summary: dict, path: str):
+    """Writes a summary to disk so runs can be compared later."""
+    with open(path, "w") as f:
+        json.dump(summary, f, indent=2)
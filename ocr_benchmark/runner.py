@@ -0,0 +1,98 @@
+# Import necessary libraries
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+# The OCR server is a flat module directory, not a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ocr_server"))
+import ocr_api  # noqa: E402
+
+STAGES = ("decode", "crop", "split", "preprocess", "recognize")
+ENCODINGS = ("png", "jpeg", "raw")
+
+
+def encode_frame(frame: np.ndarray, encoding: str) -> bytes:
+    """Encodes a rendered BGR frame the way a client would upload it."""
+    if encoding == "png":
+        return cv2.imencode(".png", frame)[1].tobytes()
+    if encoding == "jpeg":
+        return cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+    if encoding == "raw":
+        height, width = frame.shape[:2]
+        header = np.array([width, height, 1, 0], dtype="<u4").tobytes()
+        return header + cv2.cvtColor(frame, cv2.COLOR_BGR2RGBA).tobytes()
+    raise ValueError(f"Unknown encoding '{encoding}', expected one of {', '.join(ENCODINGS)}")
+
+
+def run_benchmark(frames, engine: str = ocr_api.OCR_ENGINE, preprocess: str = ocr_api.PREPROCESS_MODE,
+                  encoding: str = "png", use_cache: bool = False, redetect: bool = True) -> dict:
+    """
+    Drives the OCR pipeline stage by stage over (frame, board) pairs and records timings.
+    - decode: `decode_frame` on the encoded upload
+    - crop: `load_and_crop_board_from_array` (full detection every frame unless `redetect` is False)
+    - split: `split_into_tiles`
+    - preprocess: `preprocess_tile` on all 16 tiles ("pil") or `preprocess_board` ("numpy")
+    - recognize: `ocr_board` with the selected engine
+    Returns raw results: per-stage latencies in milliseconds, end-to-end latencies,
+    per-value tile counts and failures.
+    """
+    results = {
+        "engine": engine,
+        "preprocess": preprocess,
+        "encoding": encoding,
+        "use_cache": use_cache,
+        "stages": {stage: [] for stage in STAGES},
+        "total": [],
+        "tiles": {},  # value -> [correct, seen]
+        "boards_correct": 0,
+        "frames": 0,
+        "errors": {},
+    }
+    if not use_cache:
+        ocr_api.tile_cache.clear()
+
+    for frame, truth in frames:
+        contents = encode_frame(frame, encoding)
+        results["frames"] += 1
+        timings = {}
+        try:
+            start = time.perf_counter()
+            img_array = ocr_api.decode_frame(contents)
+            timings["decode"] = time.perf_counter()
+
+            board = ocr_api.load_and_crop_board_from_array(img_array, redetect=redetect)
+            timings["crop"] = time.perf_counter()
+
+            tiles = ocr_api.split_into_tiles(board)
+            timings["split"] = time.perf_counter()
+
+            if preprocess == "numpy":
+                ocr_api.preprocess_board(board)
+            else:
+                [ocr_api.preprocess_tile(tile) for tile in tiles]
+            timings["preprocess"] = time.perf_counter()
+
+            predicted = ocr_api.ocr_board(tiles, engine, use_cache, preprocess)
+            timings["recognize"] = time.perf_counter()
+        except Exception as e:
+            message = str(e)
+            results["errors"][message] = results["errors"].get(message, 0) + 1
+            continue
+
+        previous = start
+        for stage in STAGES:
+            results["stages"][stage].append((timings[stage] - previous) * 1000)
+            previous = timings[stage]
+        # The standalone preprocess stage isn't part of the served pipeline, so leave it out of the total
+        results["total"].append((timings["recognize"] - start - (timings["preprocess"] - timings["split"])) * 1000)
+
+        for value, guess in zip(truth.ravel().tolist(), predicted.ravel().tolist()):
+            counts = results["tiles"].setdefault(value, [0, 0])
+            counts[0] += int(value == guess)
+            counts[1] += 1
+        results["boards_correct"] += int(np.array_equal(truth, predicted))
+
+    return results
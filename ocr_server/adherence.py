@@ -0,0 +1,144 @@
+# Import necessary libraries
+import json
+import os
+from threading import Lock
+
+import numpy as np
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+DEFAULT_CENTROID_PATH = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "server", "public", "centroid.jsonl"))
+CENTROID_PATH = os.environ.get("CENTROID_PATH", DEFAULT_CENTROID_PATH)
+
+router = APIRouter(prefix="/adherence")
+
+
+class CentroidCache:
+    """
+    Keeps the centroid resident in memory as a float64 vector.
+    The file is re-read only when its modification time changes, so a regenerated
+    centroid is picked up without restarting the server.
+    """
+
+    def __init__(self, path: str = CENTROID_PATH):
+        self.path = path
+        self._centroid = None
+        self._mtime = None
+        self._lock = Lock()
+
+    def get(self) -> np.ndarray:
+        """
+        Returns the centroid, reloading it if the file changed.
+        Raises FileNotFoundError when there is no centroid file and ValueError when it isn't
+        a non-empty list of numbers.
+        """
+        mtime = os.path.getmtime(self.path)
+        with self._lock:
+            if self._centroid is None or mtime != self._mtime:
+                with open(self.path, "r") as f:
+                    try:
+                        centroid = np.asarray(json.load(f), dtype=np.float64)
+                    except (TypeError, ValueError) as e:
+                        raise ValueError(f"Centroid at {self.path} is not valid: {e}") from e
+                if centroid.ndim != 1 or not centroid.size:
+                    raise ValueError(f"Centroid at {self.path} is not valid: expected a non-empty vector")
+                self._centroid, self._mtime = centroid, mtime
+            return self._centroid
+
+
+centroid_cache = CentroidCache()
+
+
+async def _load_centroid():
+    """Reads the centroid off the event loop; returns (centroid, None) or (None, error response)."""
+    try:
+        return await run_in_threadpool(centroid_cache.get), None
+    except FileNotFoundError:
+        return None, JSONResponse(content={"error": f"Centroid not found at {centroid_cache.path}"}, status_code=404)
+    except ValueError as e:
+        return None, JSONResponse(content={"error": str(e)}, status_code=503)
+
+
+def _safe_ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """Elementwise division that yields 0 where the denominator is 0 (zero-length vectors)."""
+    out = np.zeros_like(numerator)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def score_batch(response_embeddings, prompt_embeddings, centroid: np.ndarray) -> dict:
+    """
+    Scores n response/prompt embedding pairs at once, matching `GameAnalyzer._determineAdherance`.
+    - base: cosine similarity of each response and prompt
+    - orthogonal: cosine similarity after removing each vector's component along the centroid
+    - adherence: the mean of the two
+    `prompt_embeddings` may be (n, d) or a single (d,) vector shared by every response.
+    The orthogonalized vectors are never built: their dot products and norms follow from
+    R.P, R.c and P.c, so the whole batch is a handful of row-wise reductions.
+    """
+    responses = np.atleast_2d(np.asarray(response_embeddings, dtype=np.float64))
+    prompts = np.asarray(prompt_embeddings, dtype=np.float64)
+    prompts = np.broadcast_to(prompts, responses.shape) if prompts.ndim == 1 else prompts
+    if prompts.shape != responses.shape or responses.shape[1] != centroid.shape[0]:
+        raise ValueError(f"Shape mismatch: responses {responses.shape}, prompts {prompts.shape}, "
+                         f"centroid {centroid.shape}")
+
+    rp = np.einsum("ij,ij->i", responses, prompts)
+    rr = np.einsum("ij,ij->i", responses, responses)
+    pp = np.einsum("ij,ij->i", prompts, prompts)
+    rc = responses @ centroid
+    pc = prompts @ centroid
+    cc = float(centroid @ centroid)
+
+    base = _safe_ratio(rp, np.sqrt(rr * pp))
+    if cc > 0:
+        orth_dot = rp - rc * pc / cc
+        orth_norms = np.sqrt(np.maximum(rr - rc ** 2 / cc, 0) * np.maximum(pp - pc ** 2 / cc, 0))
+    else:
+        orth_dot, orth_norms = rp, np.sqrt(rr * pp)
+    orthogonal = _safe_ratio(orth_dot, orth_norms)
+
+    return {
+        "base": base.tolist(),
+        "orthogonal": orthogonal.tolist(),
+        "adherence": ((base + orthogonal) / 2).tolist(),
+    }
+
+
+# --- FastAPI Endpoints ---
+
+@router.post("/score")
+async def score_endpoint(request: Request):
+    """
+    Scores a batch of embedding pairs against the resident centroid.
+    Body: {"response_embeddings": [[...], ...], "prompt_embeddings": [[...], ...]}, or
+    "prompt_embedding": [...] when every response shares one user prompt.
+    Returns {"base": [...], "orthogonal": [...], "adherence": [...]} in input order.
+    """
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            return JSONResponse(content={"error": "body must be a JSON object"}, status_code=400)
+        prompts = body.get("prompt_embeddings", body.get("prompt_embedding"))
+        if body.get("response_embeddings") is None or prompts is None:
+            return JSONResponse(content={"error": "response_embeddings and prompt_embedding(s) are required"},
+                                status_code=400)
+        centroid, error = await _load_centroid()
+        if error is not None:
+            return error
+        return await run_in_threadpool(score_batch, body["response_embeddings"], prompts, centroid)
+    except (TypeError, ValueError) as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@router.get("/centroid")
+async def centroid_info():
+    """Returns where the centroid was loaded from and its dimensionality."""
+    centroid, error = await _load_centroid()
+    if error is not None:
+        return error
+    return {"path": centroid_cache.path, "dim": int(centroid.shape[0]), "norm": float(np.linalg.norm(centroid))}
@@ -0,0 +1,261 @@
+# Import necessary libraries
+import argparse
+import json
+import os
+import re
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".raw")
+CHECKPOINT_FILENAME = "checkpoint.json"
+DEFAULT_SOURCE = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "server", "public", "screencaps"))
+
+
+def _natural_key(name: str) -> list:
+    """Sorts screenshot2.png before screenshot10.png."""
+    return [int(part) if part.isdigit() else part for part in re.split(r"(\d+)", name)]
+
+
+# --- Sources ---
+
+def list_frames(source: str) -> list:
+    """
+    Names of every screenshot in a directory (recursively), .zip or .tar(.gz) archive.
+    Directories and zips are listed in natural order; tars keep archive order, since
+    their members can only be read sequentially. Either way the order is stable across runs.
+    """
+    if os.path.isdir(source):
+        names = sorted((os.path.relpath(os.path.join(root, filename), source)
+                        for root, _, filenames in os.walk(source) for filename in filenames), key=_natural_key)
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            names = sorted((info.filename for info in archive.infolist() if not info.is_dir()), key=_natural_key)
+    elif tarfile.is_tarfile(source):
+        with tarfile.open(source) as archive:
+            names = [member.name for member in archive if member.isfile()]
+    else:
+        raise ValueError(f"{source} is not a directory, zip or tar archive")
+    return [name for name in names if name.lower().endswith(IMAGE_EXTENSIONS)]
+
+
+def read_frames(source: str, names: list):
+    """Yields (name, bytes) for `names`, in order."""
+    if os.path.isdir(source):
+        for name in names:
+            with open(os.path.join(source, name), "rb") as f:
+                yield name, f.read()
+    elif zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for name in names:
+                yield name, archive.read(name)
+    else:
+        remaining = deque(names)
+        with tarfile.open(source) as archive:
+            for member in archive:
+                if remaining and member.name == remaining[0]:
+                    remaining.popleft()
+                    yield member.name, archive.extractfile(member).read()
+
+
+# --- Workers ---
+
+def _init_worker(workers: int):
+    """Gives each worker process its share of the CPUs for Tesseract threads."""
+    import ocr_api
+
+    ocr_api.init_worker(workers)
+
+
+def ocr_frame(name: str, contents: bytes, engine: str, preprocess: str, device_id: str = None) -> dict:
+    """OCRs one frame in a worker process; failures become {"name", "error"} records."""
+    # Imported here so only the workers pay for loading the OCR pipeline
+    import ocr_api
+
+    try:
+        img_array = ocr_api.decode_frame(contents)
+        board = ocr_api.load_and_crop_board_from_array(img_array, device_id)
+        tiles = ocr_api.split_into_tiles(board)
+        return {"name": name, "board": ocr_api.ocr_board(tiles, engine, preprocess=preprocess).tolist()}
+    except Exception as e:
+        return {"name": name, "error": str(e)}
+
+
+# --- Output ---
+
+class ShardWriter:
+    """
+    Streams results into numbered shards in `output_dir`.
+    Each shard is a JSONL file written and flushed line by line, so a killed run keeps every
+    finished frame, plus an .npz with the names, a (n, 4, 4) board array and an ok mask,
+    written when the shard is full. checkpoint.json records the closed shards.
+    """
+
+    def __init__(self, output_dir: str, shard_size: int, settings: dict):
+        self.output_dir = output_dir
+        self.shard_size = shard_size
+        self.settings = settings
+        self.checkpoint_path = os.path.join(output_dir, CHECKPOINT_FILENAME)
+        self.closed_shards = 0
+        self.records = []
+        self.file = None
+
+    def _shard_path(self, shard: int, extension: str) -> str:
+        return os.path.join(self.output_dir, f"shard-{shard:05d}.{extension}")
+
+    def resume(self) -> int:
+        """Loads the checkpoint and the open shard's complete lines; returns how many frames are done."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, "r") as f:
+                checkpoint = json.load(f)
+            if checkpoint["settings"] != self.settings:
+                raise ValueError(f"{self.output_dir} holds a run with different settings: {checkpoint['settings']}")
+            self.closed_shards = checkpoint["closed_shards"]
+
+        path = self._shard_path(self.closed_shards, "jsonl")
+        valid_bytes = 0
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self.records.append(json.loads(line))
+                    valid_bytes += len(line)
+            # Drop a line cut off by the previous run
+            with open(path, "r+b") as f:
+                f.truncate(valid_bytes)
+        self.file = open(path, "a")
+        # A run killed after filling a shard but before closing it left a full (or, from older
+        # runs, overfull) shard: close it now and carry any extra lines into the next one
+        overflow = self.records[self.shard_size:]
+        if overflow:
+            self.file.close()
+            self.records = self.records[:self.shard_size]
+            self.file = open(path, "w")
+            self.file.writelines(json.dumps(record) + "\n" for record in self.records)
+        if len(self.records) >= self.shard_size:
+            self._next_shard()
+        for record in overflow:
+            self.write(record)
+        self._save_checkpoint()
+        return self.closed_shards * self.shard_size + len(self.records)
+
+    def write(self, record: dict):
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+        self.records.append(record)
+        if len(self.records) >= self.shard_size:
+            self._next_shard()
+
+    def _next_shard(self):
+        self._close_shard()
+        self.file = open(self._shard_path(self.closed_shards, "jsonl"), "a")
+
+    def _write_npz(self):
+        ok = np.array(["board" in record for record in self.records], dtype=bool)
+        boards = np.full((len(self.records), 4, 4), -1, dtype=np.int32)
+        for i, record in enumerate(self.records):
+            if "board" in record:
+                boards[i] = record["board"]
+        np.savez(self._shard_path(self.closed_shards, "npz"),
+                 names=np.array([record["name"] for record in self.records]), boards=boards, ok=ok)
+
+    def _close_shard(self):
+        self.file.close()
+        self._write_npz()
+        self.closed_shards += 1
+        self.records = []
+        self._save_checkpoint()
+
+    def _save_checkpoint(self):
+        tmp_path = self.checkpoint_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"settings": self.settings, "closed_shards": self.closed_shards,
+                       "shard_size": self.shard_size}, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        """Writes the final partial shard's .npz; its JSONL stays open for appending on resume."""
+        self.file.close()
+        if self.records:
+            self._write_npz()
+
+
+def run(source: str, output_dir: str, workers: int = None, engine: str = "hybrid", preprocess: str = "numpy",
+        shard_size: int = 10000, device_id: str = None, limit: int = None, window: int = None) -> dict:
+    """
+    OCRs every screenshot in `source` into sharded output, resuming from `output_dir`'s checkpoint.
+    At most `window` frames are read ahead of the writer, so memory stays bounded for any archive size.
+    Returns counters for the frames processed in this run.
+    """
+    names = list_frames(source)
+    if limit is not None:
+        names = names[:limit]
+    settings = {"source": os.path.abspath(source), "engine": engine, "preprocess": preprocess,
+                "shard_size": shard_size, "device_id": device_id}
+    writer = ShardWriter(output_dir, shard_size, settings)
+    done = writer.resume()
+    if done > len(names):
+        raise ValueError(f"Checkpoint says {done} frames are done but {source} only has {len(names)}")
+    if done:
+        print(f"Resuming after {done} of {len(names)} frames")
+
+    workers = workers or os.cpu_count() or 1
+    window = window or workers * 4
+    processed = failed = 0
+    start = time.perf_counter()
+    in_flight = deque()
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool:
+            for name, contents in read_frames(source, names[done:]):
+                in_flight.append(pool.submit(ocr_frame, name, contents, engine, preprocess, device_id))
+                while len(in_flight) >= window:
+                    record = in_flight.popleft().result()
+                    writer.write(record)
+                    processed += 1
+                    failed += "error" in record
+                    if not processed % 1000:
+                        rate = processed / (time.perf_counter() - start)
+                        print(f"{done + processed}/{len(names)} frames ({rate:.1f} frames/s, {failed} failed)")
+            while in_flight:
+                record = in_flight.popleft().result()
+                writer.write(record)
+                processed += 1
+                failed += "error" in record
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {"processed": processed, "failed": failed, "total": len(names), "seconds": round(elapsed, 2),
+            "frames_per_second": round(processed / elapsed, 2) if elapsed else 0.0}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="OCR a directory or archive of screenshots into sharded boards.")
+    parser.add_argument("source", nargs="?", default=DEFAULT_SOURCE,
+                        help="screenshot directory, .zip or .tar(.gz) (default: server/public/screencaps)")
+    parser.add_argument("output_dir", help="where shards and the checkpoint are written")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--engine", choices=("tesseract", "classifier", "hybrid"), default="hybrid")
+    parser.add_argument("--preprocess", choices=("pil", "numpy"), default="numpy")
+    parser.add_argument("--shard-size", type=int, default=10000, help="frames per output shard")
+    parser.add_argument("--device-id", help="cache board geometry under this id instead of per resolution")
+    parser.add_argument("--limit", type=int, help="only the first N frames (in natural name order)")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run(args.source, args.output_dir, args.workers, args.engine, args.preprocess, args.shard_size,
+                      args.device_id, args.limit)
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(summary))
+
+
+if __name__ == "__main__":
+    main()
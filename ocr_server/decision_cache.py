@@ -0,0 +1,224 @@
+# Import necessary libraries
+import hashlib
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+import game_engine
+from game_engine import DIRECTIONS
+
+DEFAULT_DECISION_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "decision_cache.db")
+DECISION_CACHE_PATH = os.environ.get("DECISION_CACHE_PATH", DEFAULT_DECISION_CACHE_PATH)
+DECISION_CACHE_SIZE = int(os.environ.get("DECISION_CACHE_SIZE", "65536"))
+
+router = APIRouter(prefix="/decisions")
+
+# The 8 symmetries of the square, as functions on 4x4 arrays
+SYMMETRIES = [
+    (lambda b, k=k: np.rot90(b, k)) for k in range(4)
+] + [
+    (lambda b, k=k: np.rot90(np.fliplr(b), k)) for k in range(4)
+]
+
+# Unit steps (row, column) of each direction
+_STEPS = {"LEFT": (0, -1), "RIGHT": (0, 1), "UP": (-1, 0), "DOWN": (1, 0)}
+
+
+def _direction_map(symmetry) -> dict:
+    """Where each direction points after `symmetry` is applied to the board."""
+    mapping = {}
+    for direction, (dr, dc) in _STEPS.items():
+        marker = np.zeros((4, 4), dtype=np.int64)
+        marker[1, 1], marker[1 + dr, 1 + dc] = 1, 2
+        moved = symmetry(marker)
+        (r1, c1), (r2, c2) = np.argwhere(moved == 1)[0], np.argwhere(moved == 2)[0]
+        mapping[direction] = next(d for d, step in _STEPS.items() if step == (r2 - r1, c2 - c1))
+    return mapping
+
+
+_FORWARD = [_direction_map(symmetry) for symmetry in SYMMETRIES]
+_INVERSE = [{v: k for k, v in mapping.items()} for mapping in _FORWARD]
+
+
+def canonicalize(board) -> tuple:
+    """
+    Returns (canonical packed board, symmetry index) for a 4x4 board of tile values.
+    The canonical form is the smallest packed board among the 8 rotations and reflections,
+    so all symmetric positions share one cache entry.
+    """
+    values = np.asarray(board, dtype=np.int64)
+    packed = [game_engine.encode_board(symmetry(values)) for symmetry in SYMMETRIES]
+    index = int(np.argmin(packed))
+    return packed[index], index
+
+
+def prompt_key(prompt: str, model: str = "") -> str:
+    """Hashes the user strategy (and model) so decisions are only reused for the same experiment."""
+    return hashlib.sha256(f"{model}\n{(prompt or '').strip()}".encode("utf-8")).hexdigest()[:32]
+
+
+class DecisionCache:
+    """
+    Two-tier cache of model decisions keyed by (canonical board, prompt hash).
+    - Memory: an LRU of the most recently used decisions
+    - Disk: a SQLite table that survives restarts; disk hits are promoted to memory
+    Directions are stored in the canonical board's frame and mapped back on lookup.
+    """
+
+    def __init__(self, path: str = DECISION_CACHE_PATH, capacity: int = DECISION_CACHE_SIZE):
+        self.path = path
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS decisions ("
+            "board INTEGER NOT NULL, prompt TEXT NOT NULL, direction TEXT NOT NULL, reasoning TEXT, "
+            "created REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (board, prompt))"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def _db_board(board: int) -> int:
+        # SQLite integers are signed 64-bit
+        return board - (1 << 64) if board >= 1 << 63 else board
+
+    def _remember(self, key: tuple, value: tuple):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def lookup(self, board, prompt: str, model: str = ""):
+        """Returns {"direction", "reasoning", "tier"} for a cached decision, or None."""
+        canonical, symmetry = canonicalize(board)
+        key = (canonical, prompt_key(prompt, model))
+        with self._lock:
+            value, tier = self._entries.get(key), "memory"
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+            else:
+                row = self._db.execute("SELECT direction, reasoning FROM decisions WHERE board = ? AND prompt = ?",
+                                       (self._db_board(canonical), key[1])).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                value, tier = (row[0], row[1]), "disk"
+                self._remember(key, value)
+                self.disk_hits += 1
+            self._db.execute("UPDATE decisions SET hits = hits + 1 WHERE board = ? AND prompt = ?",
+                             (self._db_board(canonical), key[1]))
+            self._db.commit()
+        direction, reasoning = value
+        return {"direction": _INVERSE[symmetry][direction], "reasoning": reasoning, "tier": tier}
+
+    def insert(self, board, prompt: str, direction: str, reasoning: str = None, model: str = ""):
+        """Stores a decision made on `board`; an existing decision for the same position is replaced."""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction '{direction}'")
+        canonical, symmetry = canonicalize(board)
+        key = (canonical, prompt_key(prompt, model))
+        value = (_FORWARD[symmetry][direction], reasoning)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO decisions (board, prompt, direction, reasoning, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (self._db_board(canonical), key[1], value[0], reasoning, time.time()),
+            )
+            self._db.commit()
+            self._remember(key, value)
+            self.inserts += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stored = self._db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM decisions").fetchone()
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "path": self.path,
+                "memory_entries": len(self._entries),
+                "memory_capacity": self.capacity,
+                "disk_entries": stored[0],
+                "lifetime_hits": stored[1],
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "inserts": self.inserts,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+
+decision_cache = None
+
+
+def get_decision_cache() -> DecisionCache:
+    """Opens the cache on first use, so importing the module doesn't create the database file."""
+    global decision_cache
+    if decision_cache is None:
+        decision_cache = DecisionCache()
+    return decision_cache
+
+
+def _parse_board(body: dict):
+    board = body.get("board")
+    values = np.asarray(board) if board is not None else None
+    if values is None or values.shape != (4, 4) or not np.issubdtype(values.dtype, np.integer):
+        raise ValueError("board must be a 4x4 array of tile values")
+    return values
+
+
+# --- FastAPI Endpoints ---
+
+@router.post("/lookup")
+async def lookup_endpoint(request: Request):
+    """
+    Looks up a cached decision for a board and user strategy.
+    Body: {"board": [[...]], "prompt": "...", "model": "..."}
+    Returns {"hit": true, "direction", "reasoning", "tier"} or {"hit": false}.
+    """
+    try:
+        body = await request.json()
+        board = _parse_board(body)
+        result = await run_in_threadpool(get_decision_cache().lookup, board, body.get("prompt", ""),
+                                         body.get("model", ""))
+        return {"hit": True, **result} if result else {"hit": False}
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@router.post("/insert")
+async def insert_endpoint(request: Request):
+    """
+    Stores the model's decision for a board and user strategy.
+    Body: {"board": [[...]], "prompt": "...", "model": "...", "direction": "UP", "reasoning": "..."}
+    """
+    try:
+        body = await request.json()
+        board = _parse_board(body)
+        await run_in_threadpool(get_decision_cache().insert, board, body.get("prompt", ""), body.get("direction"),
+                                body.get("reasoning"), body.get("model", ""))
+        return {"stored": True}
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@router.get("/stats")
+def stats_endpoint():
+    """Returns hit/miss counters and the size of both tiers."""
+    return get_decision_cache().stats()
@@ -0,0 +1,344 @@
+# Import necessary libraries
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+import urllib.error
+import urllib.request
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+from fastapi import APIRouter, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+
+import metrics
+
+DEFAULT_EMBEDDING_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "embedding_cache.db")
+EMBEDDING_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_EMBEDDING_CACHE_PATH)
+EMBEDDING_CACHE_SIZE = int(os.environ.get("EMBEDDING_CACHE_SIZE", "4096"))
+# "openai" forwards misses to EMBEDDING_UPSTREAM_URL; "local" embeds offline and deterministically
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "openai")
+EMBEDDING_UPSTREAM_URL = os.environ.get("EMBEDDING_UPSTREAM_URL", "https://api.openai.com/v1/embeddings")
+EMBEDDING_LOCAL_DIM = int(os.environ.get("EMBEDDING_LOCAL_DIM", "1536"))
+# Misses arriving within this window are sent upstream as one multi-input request
+EMBEDDING_BATCH_WINDOW_MS = float(os.environ.get("EMBEDDING_BATCH_WINDOW_MS", "10"))
+EMBEDDING_MAX_BATCH = int(os.environ.get("EMBEDDING_MAX_BATCH", "256"))
+
+router = APIRouter(prefix="/v1")
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalizes, trims and collapses whitespace, so trivially different copies of a text share an entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(model: str, text: str, dimensions: int = None) -> str:
+    return hashlib.sha256(f"{model}\n{dimensions or ''}\n{text}".encode("utf-8")).hexdigest()
+
+
+# --- Backends ---
+
+class OpenAIBackend:
+    """Calls an OpenAI-compatible /v1/embeddings endpoint with every text in one request."""
+
+    def __init__(self, url: str = EMBEDDING_UPSTREAM_URL, api_key: str = None, timeout: float = 60.0):
+        self.url = url
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY", "")
+        self.timeout = timeout
+
+    def embed(self, model: str, texts: list, dimensions: int = None, api_key: str = None) -> list:
+        """Embeds `texts` with the caller's `api_key` when given, otherwise the configured key."""
+        body = {"model": model, "input": texts, "encoding_format": "float"}
+        if dimensions:
+            body["dimensions"] = dimensions
+        request = urllib.request.Request(self.url, data=json.dumps(body).encode("utf-8"), method="POST", headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {api_key or self.api_key}",
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                payload = json.load(response)
+        except urllib.error.HTTPError as e:
+            raise RuntimeError(f"Upstream returned {e.code}: {e.read().decode('utf-8', 'replace')[:500]}") from e
+        data = sorted(payload["data"], key=lambda item: item["index"])
+        return [np.asarray(item["embedding"], dtype=np.float32) for item in data]
+
+
+class LocalBackend:
+    """
+    Deterministic offline embeddings for tests and replays, with no network access.
+    Each word is hashed to a signed bucket (the hashing trick) and the counts are
+    scaled to unit length, so texts sharing words get similar vectors.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_LOCAL_DIM):
+        self.dim = dim
+
+    def _embed_one(self, model: str, text: str, dim: int) -> np.ndarray:
+        vector = np.zeros(dim, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()) or [text]:
+            digest = hashlib.blake2b(f"{model}\n{word}".encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % dim] += 1.0 if value >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, model: str, texts: list, dimensions: int = None, api_key: str = None) -> list:
+        return [self._embed_one(model, text, dimensions or self.dim) for text in texts]
+
+
+BACKENDS = {"openai": OpenAIBackend, "local": LocalBackend}
+
+
+# --- Cache ---
+
+class EmbeddingCache:
+    """
+    Two-tier cache of embeddings keyed by a hash of (model, dimensions, normalized text).
+    - Memory: an LRU of the most recently used vectors
+    - Disk: a SQLite table of float32 blobs that survives restarts; disk hits are promoted to memory
+    """
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, capacity: int = EMBEDDING_CACHE_SIZE):
+        self.path = path
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "created REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: list) -> dict:
+        """Returns {key: (vector, tier)} for every key that is cached."""
+        found = {}
+        with self._lock:
+            missing = []
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = (self._entries[key], "memory")
+                else:
+                    missing.append(key)
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})", chunk)
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype="<f4")
+                    self._remember(key, vector)
+                    found[key] = (vector, "disk")
+        return found
+
+    def put_many(self, model: str, items: list):
+        """Stores (key, vector) pairs."""
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, dim, vector, created) VALUES (?, ?, ?, ?, ?)",
+                [(key, model, len(vector), np.asarray(vector, dtype="<f4").tobytes(), now) for key, vector in items],
+            )
+            self._db.commit()
+            for key, vector in items:
+                self._remember(key, np.asarray(vector, dtype="<f4"))
+
+    def stats(self) -> dict:
+        with self._lock:
+            stored = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {"path": self.path, "memory_entries": len(self._entries), "memory_capacity": self.capacity,
+                    "disk_entries": stored}
+
+
+# --- Proxy ---
+
+class EmbeddingProxy:
+    """
+    Answers embedding requests from the cache and coalesces the misses.
+    - Single flight: a text already being fetched is awaited instead of requested again
+    - Micro-batching: misses for the same model and API key arriving within `window` seconds go
+      upstream as one multi-input request of at most `max_batch` texts
+    Cache keys use the normalized text, but upstream receives each text as sent, only trimmed.
+    All pending and batching state is touched only from the event loop thread, so no locks are needed.
+    """
+
+    def __init__(self, backend, cache: EmbeddingCache, window: float = EMBEDDING_BATCH_WINDOW_MS / 1000,
+                 max_batch: int = EMBEDDING_MAX_BATCH):
+        self.backend = backend
+        self.cache = cache
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending = {}  # key -> future for a text being fetched
+        self._batches = {}  # (model, dimensions, api_key) -> [(key, text)] waiting for the window to close
+        self.counts = {"memory": 0, "disk": 0, "merged": 0, "upstream": 0}
+        self.upstream_requests = 0
+
+    async def embed(self, model: str, texts: list, dimensions: int = None, api_key: str = None) -> list:
+        """Embeds `texts` in order, each as a float32 vector; misses are fetched with `api_key`."""
+        texts = [text.strip() for text in texts]
+        keys = [cache_key(model, normalize_text(text), dimensions) for text in texts]
+        cached = await run_in_threadpool(self.cache.get_many, [key for key in set(keys) if key not in self._pending])
+
+        futures = {}
+        for key, text in zip(keys, texts):
+            if key in futures:
+                continue
+            if key in cached:
+                vector, tier = cached[key]
+                futures[key] = vector
+                self._count(tier)
+            elif key in self._pending:
+                futures[key] = self._pending[key]
+                self._count("merged")
+            else:
+                futures[key] = self._pending[key] = asyncio.get_running_loop().create_future()
+                self._enqueue((model, dimensions, api_key), key, text)
+                self._count("upstream")
+
+        results = {}
+        for key, value in futures.items():
+            # Shielded so one caller going away doesn't cancel a fetch that others are waiting on
+            results[key] = await asyncio.shield(value) if isinstance(value, asyncio.Future) else value
+        return [results[key] for key in keys]
+
+    def _count(self, result: str):
+        self.counts[result] += 1
+        metrics.embedding_lookups_total.inc(result=result)
+
+    def _enqueue(self, group: tuple, key: str, text: str):
+        batch = self._batches.setdefault(group, [])
+        batch.append((key, text))
+        if len(batch) >= self.max_batch:
+            self._flush(group)
+        elif len(batch) == 1:
+            asyncio.get_running_loop().call_later(self.window, self._flush, group)
+
+    def _flush(self, group: tuple):
+        batch = self._batches.pop(group, None)
+        if batch:
+            asyncio.ensure_future(self._fetch(group, batch))
+
+    async def _fetch(self, group: tuple, batch: list):
+        model, dimensions, api_key = group
+        self.upstream_requests += 1
+        metrics.embedding_batch_size.observe(len(batch))
+        try:
+            vectors = await run_in_threadpool(self.backend.embed, model, [text for _, text in batch], dimensions,
+                                              api_key)
+            if len(vectors) != len(batch):
+                raise RuntimeError(f"Backend returned {len(vectors)} embeddings for {len(batch)} texts")
+            items = [(key, vector) for (key, _), vector in zip(batch, vectors)]
+            await run_in_threadpool(self.cache.put_many, model, items)
+            for key, vector in items:
+                self._pending.pop(key).set_result(vector)
+        except Exception as e:
+            for key, _ in batch:
+                future = self._pending.pop(key, None)
+                if future is not None:
+                    future.set_exception(e)
+                    # Retrieved here so an error nobody is waiting on doesn't get logged as unhandled
+                    future.exception()
+
+    def stats(self) -> dict:
+        lookups = sum(self.counts.values())
+        return {
+            "backend": type(self.backend).__name__,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "lookups": dict(self.counts),
+            "hit_rate": (self.counts["memory"] + self.counts["disk"]) / lookups if lookups else 0.0,
+            "upstream_requests": self.upstream_requests,
+            "in_flight": len(self._pending),
+            **self.cache.stats(),
+        }
+
+
+embedding_proxy = None
+
+
+def get_embedding_proxy() -> EmbeddingProxy:
+    """Creates the proxy on first use, so importing the module doesn't create the database file."""
+    global embedding_proxy
+    if embedding_proxy is None:
+        if EMBEDDING_BACKEND not in BACKENDS:
+            raise ValueError(f"Unknown EMBEDDING_BACKEND '{EMBEDDING_BACKEND}', expected one of {list(BACKENDS)}")
+        embedding_proxy = EmbeddingProxy(BACKENDS[EMBEDDING_BACKEND](), EmbeddingCache())
+    return embedding_proxy
+
+
+def _bearer_token(request: Request) -> str:
+    """Returns the client's bearer token, or None so the server's own key is used."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def _parse_input(body: dict) -> list:
+    texts = body.get("input")
+    if isinstance(texts, str):
+        texts = [texts]
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) for text in texts):
+        raise ValueError("input must be a string or a non-empty list of strings")
+    if any(not text.strip() for text in texts):
+        raise ValueError("input must not contain empty strings")
+    return texts
+
+
+# --- FastAPI Endpoints ---
+
+@router.post("/embeddings")
+async def embeddings_endpoint(request: Request):
+    """
+    OpenAI-compatible embeddings endpoint, so the OpenAI client can use the proxy as its base URL.
+    Body: {"model": "text-embedding-3-small", "input": "..." or [...], "dimensions": 1536,
+           "encoding_format": "float" or "base64"}
+    A bearer token in the Authorization header is forwarded upstream for cache misses;
+    without one the server's OPENAI_API_KEY is used.
+    """
+    try:
+        body = await request.json()
+        texts = _parse_input(body)
+        model = body.get("model") or "text-embedding-3-small"
+        encoding = body.get("encoding_format", "float")
+        if encoding not in ("float", "base64"):
+            raise ValueError("encoding_format must be 'float' or 'base64'")
+        vectors = await get_embedding_proxy().embed(model, texts, body.get("dimensions"), _bearer_token(request))
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=502)
+
+    data = []
+    for index, vector in enumerate(vectors):
+        if encoding == "base64":
+            embedding = base64.b64encode(np.asarray(vector, dtype="<f4").tobytes()).decode("ascii")
+        else:
+            embedding = vector.tolist()
+        data.append({"object": "embedding", "index": index, "embedding": embedding})
+    # Token counts are not known for cached texts; words are a rough stand-in
+    tokens = sum(len(text.split()) for text in texts)
+    return {"object": "list", "data": data, "model": model,
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+
+@router.get("/embeddings/stats")
+def stats_endpoint():
+    """Returns cache tiers, hit rate and how many upstream requests were made."""
+    return get_embedding_proxy().stats()
@@ -0,0 +1,181 @@
+# Import necessary libraries
+import numpy as np
+
+# Move order used by every batched result: column i of a result belongs to DIRECTIONS[i]
+DIRECTIONS = ("LEFT", "RIGHT", "UP", "DOWN")
+
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15  # 4 bits per cell, so tiles saturate at 2**15
+
+
+def _build_row_tables():
+    """
+    Precomputes the result of sliding every possible 16-bit row left and right.
+    A row holds four 4-bit log2 tile exponents, leftmost cell in the lowest nibble.
+    Returns (left rows, right rows, left score gains, right score gains), each indexed by row.
+    """
+    rows = np.arange(1 << 16, dtype=np.uint32)
+    cells = np.stack([(rows >> (4 * i)) & 0xF for i in range(4)], axis=1)
+    results = np.zeros((1 << 16, 2), dtype=np.uint16)
+    scores = np.zeros((1 << 16, 2), dtype=np.uint32)
+
+    for side, order in enumerate((slice(None), slice(None, None, -1))):
+        for row in range(1 << 16):
+            line = [int(v) for v in cells[row][order] if v]
+            merged, gain, i = [], 0, 0
+            while i < len(line):
+                if i + 1 < len(line) and line[i] == line[i + 1]:
+                    exponent = min(line[i] + 1, MAX_EXPONENT)
+                    merged.append(exponent)
+                    gain += 1 << exponent
+                    i += 2
+                else:
+                    merged.append(line[i])
+                    i += 1
+            merged += [0] * (4 - len(merged))
+            merged = merged[order]
+            results[row, side] = merged[0] | (merged[1] << 4) | (merged[2] << 8) | (merged[3] << 12)
+            scores[row, side] = gain
+
+    return results[:, 0].copy(), results[:, 1].copy(), scores[:, 0].copy(), scores[:, 1].copy()
+
+
+ROW_LEFT, ROW_RIGHT, SCORE_LEFT, SCORE_RIGHT = _build_row_tables()
+
+
+# --- Packing ---
+
+def encode_board(board) -> int:
+    """Packs a 4x4 board of tile values (0, 2, 4, ...) into a 64-bit integer, cell (r, c) at nibble 4r + c."""
+    packed = 0
+    for i, value in enumerate(np.asarray(board, dtype=np.int64).ravel()):
+        if value:
+            packed |= min(int(value).bit_length() - 1, MAX_EXPONENT) << (4 * i)
+    return packed
+
+
+def decode_board(packed: int) -> list:
+    """Unpacks a 64-bit board into a 4x4 list of tile values."""
+    values = [((packed >> (4 * i)) & 0xF) for i in range(16)]
+    values = [1 << v if v else 0 for v in values]
+    return [values[r * 4:(r + 1) * 4] for r in range(4)]
+
+
+def encode_boards(boards) -> np.ndarray:
+    """Packs an (n, 4, 4) array of tile values into an (n,) uint64 array."""
+    values = np.asarray(boards, dtype=np.int64).reshape(-1, 16)
+    exponents = np.zeros(values.shape, dtype=np.uint64)
+    nonzero = values > 0
+    exponents[nonzero] = np.minimum(np.log2(values[nonzero]).round(), MAX_EXPONENT).astype(np.uint64)
+    shifts = np.arange(0, 64, 4, dtype=np.uint64)
+    return np.bitwise_or.reduce(exponents << shifts, axis=1)
+
+
+def decode_boards(packed: np.ndarray) -> np.ndarray:
+    """Unpacks an (n,) uint64 array into an (n, 4, 4) int64 array of tile values."""
+    packed = np.asarray(packed, dtype=np.uint64)
+    shifts = np.arange(0, 64, 4, dtype=np.uint64)
+    exponents = ((packed[:, None] >> shifts) & np.uint64(0xF)).astype(np.int64)
+    return np.where(exponents > 0, np.left_shift(1, exponents), 0).reshape(-1, 4, 4)
+
+
+# --- Single boards ---
+
+def transpose(board: int) -> int:
+    """Swaps rows and columns of a packed board with three masked shifts per step."""
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return (b1 | (b2 >> 24) | (b3 << 24)) & 0xFFFFFFFFFFFFFFFF
+
+
+def _slide_rows(board: int, row_table, score_table) -> tuple:
+    result, gain = 0, 0
+    for shift in (0, 16, 32, 48):
+        row = (board >> shift) & ROW_MASK
+        result |= int(row_table[row]) << shift
+        gain += int(score_table[row])
+    return result, gain
+
+
+def move(board: int, direction: str) -> tuple:
+    """
+    Applies one move to a packed board, without spawning a new tile.
+    Returns (new board, score gained, whether anything moved).
+    """
+    if direction == "LEFT":
+        result, gain = _slide_rows(board, ROW_LEFT, SCORE_LEFT)
+    elif direction == "RIGHT":
+        result, gain = _slide_rows(board, ROW_RIGHT, SCORE_RIGHT)
+    elif direction == "UP":
+        result, gain = _slide_rows(transpose(board), ROW_LEFT, SCORE_LEFT)
+        result = transpose(result)
+    elif direction == "DOWN":
+        result, gain = _slide_rows(transpose(board), ROW_RIGHT, SCORE_RIGHT)
+        result = transpose(result)
+    else:
+        raise ValueError(f"Unknown direction '{direction}'")
+    return result, gain, result != board
+
+
+def legal_moves(board: int) -> list:
+    """Directions that change the board, in DIRECTIONS order."""
+    return [direction for direction in DIRECTIONS if move(board, direction)[2]]
+
+
+# --- Batches ---
+
+def transpose_batch(boards: np.ndarray) -> np.ndarray:
+    """Vectorized `transpose` over a uint64 array."""
+    a = ((boards & np.uint64(0xF0F00F0FF0F00F0F))
+         | ((boards & np.uint64(0x0000F0F00000F0F0)) << np.uint64(12))
+         | ((boards & np.uint64(0x0F0F00000F0F0000)) >> np.uint64(12)))
+    return ((a & np.uint64(0xFF00FF0000FF00FF))
+            | ((a & np.uint64(0x00FF00FF00000000)) >> np.uint64(24))
+            | ((a & np.uint64(0x00000000FF00FF00)) << np.uint64(24)))
+
+
+def _slide_rows_batch(boards: np.ndarray, row_table, score_table) -> tuple:
+    result = np.zeros_like(boards)
+    gain = np.zeros(boards.shape, dtype=np.uint32)
+    for shift in (0, 16, 32, 48):
+        row = ((boards >> np.uint64(shift)) & np.uint64(ROW_MASK)).astype(np.intp)
+        result |= row_table[row].astype(np.uint64) << np.uint64(shift)
+        gain += score_table[row]
+    return result, gain
+
+
+def apply_moves(boards, chunk_size: int = 1 << 20) -> tuple:
+    """
+    Applies all four moves to every packed board at once.
+    - boards: (n,) array of packed boards (see `encode_boards`)
+    - Returns (results, gains, legal), each (n, 4) with columns in DIRECTIONS order:
+      the boards after each move (no tile spawned), the score gained, and whether the move changed the board
+    Work is done `chunk_size` boards at a time to bound temporary memory.
+    """
+    boards = np.ascontiguousarray(boards, dtype=np.uint64).ravel()
+    results = np.empty((boards.size, 4), dtype=np.uint64)
+    gains = np.empty((boards.size, 4), dtype=np.uint32)
+
+    for start in range(0, boards.size, chunk_size):
+        chunk = boards[start:start + chunk_size]
+        out = slice(start, start + chunk.size)
+        results[out, 0], gains[out, 0] = _slide_rows_batch(chunk, ROW_LEFT, SCORE_LEFT)
+        results[out, 1], gains[out, 1] = _slide_rows_batch(chunk, ROW_RIGHT, SCORE_RIGHT)
+        transposed = transpose_batch(chunk)
+        up, gains[out, 2] = _slide_rows_batch(transposed, ROW_LEFT, SCORE_LEFT)
+        down, gains[out, 3] = _slide_rows_batch(transposed, ROW_RIGHT, SCORE_RIGHT)
+        results[out, 2] = transpose_batch(up)
+        results[out, 3] = transpose_batch(down)
+
+    legal = results != boards[:, None]
+    return results, gains, legal
+
+
+def legal_move_masks(boards) -> np.ndarray:
+    """(n, 4) bool array of which moves change each packed board, in DIRECTIONS order."""
+    return apply_moves(boards)[2]
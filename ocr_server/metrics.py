@@ -0,0 +1,176 @@
+# Import necessary libraries
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+# Latency buckets in seconds, from sub-millisecond classifier passes up to slow Tesseract fallbacks
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Stage timings for the current request, used for the Server-Timing header
+_request_timings = ContextVar("request_timings", default=None)
+
+_registry = []
+_collectors = []
+
+
+def _format_labels(label_names: tuple, label_values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """Base class for in-process metrics with optional labels, rendered in Prometheus text format."""
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, label_names: tuple = ()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, such as requests in flight."""
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    """Cumulative bucket histogram with sum and count, as Prometheus expects."""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, label_names: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+            self._values[key] = (counts, total + value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+# --- OCR server metrics ---
+
+stage_seconds = Histogram("ocr_stage_duration_seconds", "Time spent in each OCR pipeline stage.", ("stage",))
+request_seconds = Histogram("ocr_request_duration_seconds", "End-to-end HTTP request latency.", ("path",))
+requests_total = Counter("ocr_requests_total", "HTTP requests handled.", ("path", "status"))
+errors_total = Counter("ocr_errors_total", "Frames that failed, by error.", ("path", "error"))
+in_flight = Gauge("ocr_requests_in_flight", "HTTP requests currently being processed.", ("path",))
+rejected_total = Counter("ocr_rejected_total", "Requests turned away because the work queue was full.", ("path",))
+embedding_lookups_total = Counter("embedding_lookups_total", "Embedding proxy texts, by how they were answered.",
+                                  ("result",))
+embedding_batch_size = Histogram("embedding_upstream_batch_size", "Texts per upstream embedding request.",
+                                 buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048))
+
+
+def register_collector(collector):
+    """Registers a function returning extra Prometheus text lines, called on every scrape."""
+    _collectors.append(collector)
+
+
+def render_prometheus() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    for collector in _collectors:
+        lines.extend(collector())
+    return "\n".join(lines) + "\n"
+
+
+def error_label(error: Exception) -> str:
+    """Short, stable label for an error message (e.g. "Board not found in the image!")."""
+    return str(error).replace("⚠️", "").strip()[:80] or type(error).__name__
+
+
+# --- Stage timing ---
+
+@contextmanager
+def stage(name: str):
+    """Times a pipeline stage into the stage histogram and the current request's timings."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - start)
+
+
+def record_stage(name: str, seconds: float):
+    """Adds one stage duration, e.g. one reported back by a batch worker process."""
+    stage_seconds.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def start_request_timings() -> dict:
+    """Starts collecting stage timings for the current request; returns the dict being filled."""
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: dict) -> str:
+    """Formats stage timings as a Server-Timing header value (durations in milliseconds)."""
+    return ", ".join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items())
@@ -1,15 +1,97 @@
 # Import necessary libraries
-from threading import Thread
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from threading import Lock
+from typing import List
 import cv2
 import numpy as np
 import pytesseract
 from PIL import Image, ImageOps, ImageFilter
-from fastapi import FastAPI, File, UploadFile
+from fastapi import FastAPI, File, Request, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+import adherence
+import decision_cache
+import embedding_proxy
+import game_engine
+import metrics
+import solver
+from scheduler import FairScheduler, QueueFull
+from tile_classifier import DEFAULT_TEMPLATES_PATH, GLYPH_SIZE, TileClassifier
+
+# Number of worker processes for /ocr/batch, started once with the app
+OCR_WORKERS = int(os.environ.get("OCR_WORKERS", os.cpu_count() or 1))
+process_pool = None
+# Frames processed at once across all devices, and how many more may wait before requests get a 429
+OCR_WORKER_BUDGET = int(os.environ.get("OCR_WORKER_BUDGET", OCR_WORKERS))
+OCR_QUEUE_SIZE = int(os.environ.get("OCR_QUEUE_SIZE", "64"))
+scheduler = FairScheduler(OCR_WORKER_BUDGET, OCR_QUEUE_SIZE)
+# Shared Tesseract threads, so concurrent requests don't each start one thread per tile
+TESSERACT_THREADS = int(os.environ.get("TESSERACT_THREADS", os.cpu_count() or 1))
+tesseract_pool = ThreadPoolExecutor(max_workers=TESSERACT_THREADS, thread_name_prefix="tesseract")
+
+
+def init_worker(workers: int):
+    """
+    Process pool initializer: shrinks this worker's Tesseract pool to its share of the CPUs,
+    so `workers` processes together run about one Tesseract thread per core.
+    """
+    global tesseract_pool
+    tesseract_pool = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 1) // max(1, workers)),
+                                        thread_name_prefix="tesseract")
+
+
+def _warm_worker(_) -> int:
+    """No-op task used to spawn and import every pool worker before the first request."""
+    return os.getpid()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Starts the warm OCR process pool on startup and shuts it down on exit."""
+    global process_pool
+    process_pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, initializer=init_worker, initargs=(OCR_WORKERS,))
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*[loop.run_in_executor(process_pool, _warm_worker, i) for i in range(OCR_WORKERS)])
+    yield
+    process_pool.shutdown(cancel_futures=True)
+    process_pool = None
+
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Recognition engines: "tesseract" (OCR every tile), "classifier" (pixels only),
+# or "hybrid" (classifier, with low-confidence tiles sent to Tesseract)
+OCR_ENGINES = ("tesseract", "classifier", "hybrid")
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "hybrid")
+OCR_CONFIDENCE_THRESHOLD = float(os.environ.get("OCR_CONFIDENCE_THRESHOLD", "0.9"))
+TILE_CACHE_SIZE = int(os.environ.get("TILE_CACHE_SIZE", "4096"))
+# Adds a Server-Timing header with per-stage durations to every response when enabled
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+# Tile preprocessing before Tesseract: "pil" (per-tile PIL chain) or "numpy" (batched across tiles)
+PREPROCESS_MODES = ("pil", "numpy")
+PREPROCESS_MODE = os.environ.get("PREPROCESS_MODE", "numpy")
+SCALE_ERROR = "scale must be in (0, 1]"
+TILE_VALUES = [0] + [2 ** i for i in range(1, 12)]
+
+# Raw `adb exec-out screencap` (no -p) pixel formats: format id -> (bytes per pixel, conversion to BGR)
+RAW_PIXEL_FORMATS = {
+    1: (4, cv2.COLOR_RGBA2BGR),  # RGBA_8888
+    2: (4, cv2.COLOR_RGBA2BGR),  # RGBX_8888
+    3: (3, cv2.COLOR_RGB2BGR),  # RGB_888
+    4: (2, cv2.COLOR_BGR5652BGR),  # RGB_565 (little-endian, red in the high bits)
+    5: (4, cv2.COLOR_BGRA2BGR),  # BGRA_8888
+}
+
+# Loads calibrated glyph templates if present, otherwise classifies by tile color alone
+tile_classifier = TileClassifier.load(os.environ.get("TILE_TEMPLATES_PATH", DEFAULT_TEMPLATES_PATH))
 
 # Enable CORS to allow frontend applications to make API requests
 app.add_middleware(
@@ -20,16 +102,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Batch embedding adherence scoring (/adherence/...)
+app.include_router(adherence.router)
+app.include_router(decision_cache.router)
+# OpenAI-compatible caching embedding proxy (/v1/embeddings)
+app.include_router(embedding_proxy.router)
+
 
 # --- Core Functions ---
 
-def load_and_crop_board_from_array(img_array: np.ndarray) -> Image.Image:
+def parse_raw_header(contents: bytes):
+    """
+    Parses the header of a raw framebuffer dump: little-endian uint32 width, height and
+    pixel format, followed on Android 9+ by a uint32 color space.
+    Returns (width, height, pixel_format, pixel_offset), or None if `contents` isn't a raw frame.
+    """
+    if len(contents) < 12:
+        return None
+    width, height, pixel_format = np.frombuffer(contents, dtype="<u4", count=3).tolist()
+    if pixel_format not in RAW_PIXEL_FORMATS or not width or not height:
+        return None
+    frame_size = width * height * RAW_PIXEL_FORMATS[pixel_format][0]
+    for offset in (16, 12):
+        if len(contents) == offset + frame_size:
+            return width, height, pixel_format, offset
+    return None
+
+
+def decode_frame(contents: bytes, scale: float = 1.0) -> np.ndarray:
+    """
+    Turns an uploaded frame into a BGR array for board detection.
+    - Raw framebuffers are mapped with `np.frombuffer` (no decode), encoded images go through `cv2.imdecode`
+    - `scale` < 1 downscales the frame before detection. 3 and 4-byte raw frames are resized
+      before color conversion; RGB_565 is converted first, since its pixels are packed in 2 bytes
+    """
+    if not 0 < scale <= 1:
+        raise ValueError(SCALE_ERROR)
+
+    header = parse_raw_header(contents)
+    if header is None:
+        img_array = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        if img_array is None:
+            raise ValueError("Could not decode image")
+        conversion = None
+    else:
+        width, height, pixel_format, offset = header
+        channels, conversion = RAW_PIXEL_FORMATS[pixel_format]
+        img_array = np.frombuffer(contents, np.uint8, count=width * height * channels, offset=offset)
+        img_array = img_array.reshape(height, width, channels)
+
+    # Averaging packed 2-byte pixels would mix their bit fields, so convert those before resizing
+    if conversion is not None and img_array.shape[2] == 2:
+        img_array, conversion = cv2.cvtColor(img_array, conversion), None
+    if scale < 1:
+        img_array = cv2.resize(img_array, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    if conversion is not None:
+        img_array = cv2.cvtColor(img_array, conversion)
+    return img_array
+
+
+def detect_board_rect(img_array: np.ndarray) -> tuple:
     """
-    Detects and crops the 2048 game board from an image.
+    Detects the 2048 game board in an image and returns its (x, y, w, h) rectangle.
     - Converts to grayscale
     - Applies Gaussian blur and Canny edge detection
     - Finds square-like contours with large enough area
-    - Crops the largest valid board region
+    - Picks the largest valid board region
     """
     gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
     edges = cv2.Canny(cv2.GaussianBlur(gray, (5, 5), 0), 50, 150)
@@ -46,7 +184,103 @@ def load_and_crop_board_from_array(img_array: np.ndarray) -> Image.Image:
         raise ValueError("⚠️ Board not found in the image!")
 
     # Use the largest candidate
-    x, y, w, h = max(candidates, key=lambda b: b[2] * b[3])
+    return max(candidates, key=lambda b: b[2] * b[3])
+
+
+class BoardGeometryCache:
+    """
+    Remembers where the board was detected, keyed by device id or frame resolution.
+    Each entry stores the board rectangle and the mean color of the four board-frame
+    strips just inside it; a later frame reuses the rectangle only if those strips
+    still match, which costs a few small slices instead of a full contour search.
+    """
+
+    def __init__(self, max_entries: int = 64, tolerance: float = 12.0):
+        self.max_entries = max_entries
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def key(img_array: np.ndarray, device_id: str = None):
+        """Device id when the caller supplies one, otherwise the frame resolution."""
+        return ("device", device_id) if device_id else ("resolution",) + img_array.shape[:2]
+
+    @staticmethod
+    def frame_signature(img_array: np.ndarray, rect: tuple):
+        """Mean color of the top, bottom, left and right frame strips of `rect`, or None if out of bounds."""
+        x, y, w, h = rect
+        if x < 0 or y < 0 or y + h > img_array.shape[0] or x + w > img_array.shape[1]:
+            return None
+        t0, t1 = int(w * 0.004) + 1, int(w * 0.012) + 2
+        step = max(1, w // 64)
+        strips = (
+            img_array[y + t0:y + t1, x + t1:x + w - t1:step],
+            img_array[y + h - t1:y + h - t0, x + t1:x + w - t1:step],
+            img_array[y + t1:y + h - t1:step, x + t0:x + t1],
+            img_array[y + t1:y + h - t1:step, x + w - t1:x + w - t0],
+        )
+        return np.array([s.reshape(-1, s.shape[-1]).mean(axis=0) for s in strips], dtype=np.float32)
+
+    def lookup(self, img_array: np.ndarray, device_id: str = None):
+        """Returns the cached rectangle if the board is still there, otherwise None."""
+        key = self.key(img_array, device_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is not None:
+            rect, signature = entry
+            current = self.frame_signature(img_array, rect)
+            if current is not None and np.abs(current - signature).max() <= self.tolerance:
+                with self._lock:
+                    self.hits += 1
+                return rect
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, img_array: np.ndarray, rect: tuple, device_id: str = None):
+        """Caches a freshly detected rectangle, evicting the least recently used entry if full."""
+        signature = self.frame_signature(img_array, rect)
+        if signature is None:
+            return
+        key = self.key(img_array, device_id)
+        with self._lock:
+            self._entries[key] = (rect, signature)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, device_id: str = None):
+        """Forgets one device's geometry, or every entry when no device id is given."""
+        with self._lock:
+            if device_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(("device", device_id), None)
+
+
+board_geometry_cache = BoardGeometryCache()
+
+
+def load_and_crop_board_from_array(img_array: np.ndarray, device_id: str = None,
+                                   redetect: bool = False, geometry_cache: BoardGeometryCache = None) -> Image.Image:
+    """
+    Crops the 2048 game board from an image.
+    - Reuses the cached board rectangle for this device (or resolution) when its frame still matches
+    - Otherwise, or when `redetect` is set, runs full detection and caches the result
+    `geometry_cache` is a session's own cache; the shared one is used when none is given.
+    """
+    geometry_cache = geometry_cache or board_geometry_cache
+    rect = None if redetect else geometry_cache.lookup(img_array, device_id)
+    if rect is None:
+        rect = detect_board_rect(img_array)
+        geometry_cache.store(img_array, rect, device_id)
+
+    x, y, w, h = rect
     board = Image.fromarray(cv2.cvtColor(img_array[y:y + h, x:x + w], cv2.COLOR_BGR2RGB))
     return board
 
@@ -90,69 +324,683 @@ def preprocess_tile(tile: Image.Image) -> Image.Image:
     return tile
 
 
-def ocr_tile(tile: Image.Image, val_idx: int, values: list):
+def to_grayscale(rgb: np.ndarray) -> np.ndarray:
+    """Converts RGB pixels to 8-bit luma with the same integer weights PIL uses for "L"."""
+    rgb = rgb.astype(np.uint32)
+    return ((rgb[..., 0] * 19595 + rgb[..., 1] * 38470 + rgb[..., 2] * 7471 + 0x8000) >> 16).astype(np.uint8)
+
+
+def preprocess_tile_stack(gray: np.ndarray, margin_ratio=0.15) -> np.ndarray:
     """
-    Performs OCR on a single tile and updates the shared `values` list at the specified index.
-    Uses Tesseract with digit whitelist and Page Segmentation Mode 10 (single character).
+    Batched equivalent of `preprocess_tile` for grayscale tiles shaped (..., h, w).
+    Contrast stretch, threshold, inversion of dark tiles, 3x3 median filter and
+    border trim all run as array operations across every tile at once.
+    """
+    flat = gray.reshape(-1, *gray.shape[-2:]).astype(np.float32)
+    h, w = flat.shape[1:]
+
+    # Autocontrast: stretch each tile's [min, max] to [0, 255] (tiles with a flat histogram are unchanged)
+    lo = flat.min(axis=(1, 2), keepdims=True)
+    hi = flat.max(axis=(1, 2), keepdims=True)
+    scale = np.where(hi > lo, 255.0 / np.maximum(hi - lo, 1), 1.0)
+    offset = np.where(hi > lo, lo, 0.0)
+    stretched = np.clip(np.floor((flat - offset) * scale), 0, 255)
+
+    binary = stretched > 150
+    dark = binary.mean(axis=(1, 2)) * 255 < 100
+    binary ^= dark[:, None, None]
+
+    # Median of a binary 3x3 window is a majority vote; edges are replicated like PIL's filter
+    padded = np.pad(binary.astype(np.uint8), ((0, 0), (1, 1), (1, 1)), mode="edge")
+    votes = sum(padded[:, dy:dy + h, dx:dx + w] for dy in range(3) for dx in range(3))
+    filtered = np.where(votes >= 5, 255, 0).astype(np.uint8)
+
+    top, bottom = int(h * margin_ratio), int(h * (1 - margin_ratio))
+    left, right = int(w * margin_ratio), int(w * (1 - margin_ratio))
+    trimmed = filtered[:, top:bottom, left:right]
+    return trimmed.reshape(*gray.shape[:-2], *trimmed.shape[1:])
+
+
+def preprocess_board(board: Image.Image) -> np.ndarray:
+    """
+    Preprocesses all 16 tiles of a cropped board in one pass.
+    Reshapes the board into a (4, 4, h, w) grayscale array using the same tile grid as
+    `split_into_tiles`, then runs `preprocess_tile_stack` on it.
+    """
+    tile_size = board.width // 4
+    gray = to_grayscale(np.asarray(board.convert("RGB"))[:tile_size * 4, :tile_size * 4])
+    if gray.shape[0] < tile_size * 4:
+        # Boards shorter than they are wide: pad with black, as PIL's out-of-bounds crop does
+        gray = np.pad(gray, ((0, tile_size * 4 - gray.shape[0]), (0, 0)))
+    tiles = gray.reshape(4, tile_size, 4, tile_size).transpose(0, 2, 1, 3)
+    return preprocess_tile_stack(tiles)
+
+
+class TileCache:
+    """
+    Bounded LRU cache of tile recognition results, keyed by coarse tile features.
+    A given value always renders the same way on a device, so repeated tiles skip
+    preprocessing and OCR entirely. Hit, miss and eviction counters help size the cache.
+    """
+
+    def __init__(self, max_entries: int = TILE_CACHE_SIZE, color_step: int = 16, mask_size: int = 8):
+        self.max_entries = max_entries
+        self.color_step = color_step
+        self.mask_size = mask_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def keys(self, backgrounds: np.ndarray, glyphs: np.ndarray, tag: str) -> list:
+        """
+        Keys tiles by their `TileClassifier.tile_features`, which survive JPEG noise and rescaling:
+        - the background color, in buckets of `color_step`
+        - the glyph mask pooled to `mask_size` x `mask_size` and binarized at half coverage
+        The tag keeps results from different engines and preprocess modes apart.
+        """
+        colors = (backgrounds // self.color_step).astype(np.uint8)
+        pool = GLYPH_SIZE // self.mask_size
+        masks = glyphs.reshape(len(glyphs), self.mask_size, pool, self.mask_size, pool).mean(axis=(2, 4)) > 0.5
+        masks = np.packbits(masks.reshape(len(glyphs), -1), axis=1)
+        prefix = tag.encode()
+        return [hashlib.blake2b(prefix + color.tobytes() + mask.tobytes(), digest_size=16).digest()
+                for color, mask in zip(colors, masks)]
+
+    def get(self, key: bytes):
+        """Returns the cached (value, source, confidence) for `key`, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: bytes, entry: tuple):
+        """Stores a recognition result, evicting the least recently used entries when full."""
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drops every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Returns size and hit/miss/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+tile_cache = TileCache()
+
+
+def read_tile_digits(tile: Image.Image) -> int:
+    """
+    Runs Tesseract on an already preprocessed tile with digit whitelist and Page
+    Segmentation Mode 10 (single character). Returns the tile value, or 0 when the
+    text isn't a 2048 value.
     """
-    tile = preprocess_tile(tile)
     config = "--psm 10 -c tessedit_char_whitelist=0123456789"
     text = pytesseract.image_to_string(tile, config=config).strip()
     if text.isdigit():
         val = int(text)
         # Accept only common 2048 tile values
-        if val in [2 ** i for i in range(1, 12)] + [32, 128, 512]:
-            values[val_idx] = val
-            return
-    values[val_idx] = 0
+        if val in TILE_VALUES[1:]:
+            return val
+    return 0
+
+
+def tesseract_tile_value(tile: Image.Image) -> int:
+    """Preprocesses a raw tile with the PIL chain and reads it with Tesseract."""
+    return read_tile_digits(preprocess_tile(tile))
 
 
-def ocr_board(tiles: list) -> np.ndarray:
+def ocr_tile(tile: Image.Image, val_idx: int, values: list, preprocessed: bool = False):
     """
-    Launches parallel OCR threads for all 16 tiles.
-    Returns the board as a 4x4 NumPy array of recognized values.
+    Performs OCR on a single tile and updates the shared `values` list at the specified index.
+    Set `preprocessed` when the tile already went through `preprocess_tile_stack`.
     """
-    values = [-1] * 16
-    threads = []
-    for idx, tile in enumerate(tiles):
-        t = Thread(target=ocr_tile, args=(tile, idx, values))
-        t.start()
-        threads.append(t)
+    values[val_idx] = read_tile_digits(tile) if preprocessed else tesseract_tile_value(tile)
 
-    for t in threads:
-        t.join()
+
+def recognize_tiles(tiles: list, engine: str = OCR_ENGINE, use_cache: bool = True,
+                    preprocess: str = PREPROCESS_MODE) -> tuple:
+    """
+    Recognizes any number of tiles with the selected engine.
+    - "hybrid" and "tesseract" answer tiles already in the tile cache from it (unless `use_cache`
+      is False); "classifier" is as fast as a cache lookup, so it skips the cache
+    - "classifier" and "hybrid" classify the remaining tiles from pixels in one NumPy pass
+    - "hybrid" sends tiles below OCR_CONFIDENCE_THRESHOLD to Tesseract
+    - "tesseract" OCRs every remaining tile in parallel on the shared Tesseract thread pool
+    Tiles headed for Tesseract are preprocessed per tile with PIL ("pil") or all at once ("numpy").
+    Returns (values, sources, confidences) lists: per tile, the value, the engine
+    that decided it and its confidence (1.0 for Tesseract results).
+    Only trusted results are cached: confident classifier results, and Tesseract reads that
+    found a tile value or a tile with no glyph at all.
+    """
+    if engine not in OCR_ENGINES:
+        raise ValueError(f"Unknown OCR engine '{engine}', expected one of {', '.join(OCR_ENGINES)}")
+    if preprocess not in PREPROCESS_MODES:
+        raise ValueError(f"Unknown preprocess mode '{preprocess}', expected one of {', '.join(PREPROCESS_MODES)}")
+
+    values = [-1] * len(tiles)
+    sources = ["tesseract"] * len(tiles)
+    confidences = [1.0] * len(tiles)
+    use_cache = use_cache and engine != "classifier" and len(tiles) > 0
+    # One feature pass serves both the cache keys and the classifier
+    features = TileClassifier.tile_features(tiles) if tiles and (use_cache or engine != "tesseract") else None
+    keys = tile_cache.keys(*features, f"{engine}:{preprocess}") if use_cache else [None] * len(tiles)
+
+    pending = []
+    for idx, key in enumerate(keys):
+        cached = tile_cache.get(key) if use_cache else None
+        if cached is None:
+            pending.append(idx)
+        else:
+            values[idx], sources[idx], confidences[idx] = cached
+
+    fallback = pending
+    if engine != "tesseract" and pending:
+        backgrounds, glyphs = features
+        predicted, scores = tile_classifier.classify_features(backgrounds[pending], glyphs[pending])
+        fallback = []
+        for idx, val, score in zip(pending, predicted.tolist(), scores.tolist()):
+            if engine == "hybrid" and score < OCR_CONFIDENCE_THRESHOLD:
+                fallback.append(idx)
+                continue
+            values[idx] = val
+            sources[idx] = "classifier"
+            confidences[idx] = round(score, 4)
+
+    targets = {idx: tiles[idx] for idx in fallback}
+    if preprocess == "numpy" and fallback:
+        with metrics.stage("preprocess"):
+            gray = to_grayscale(np.stack([np.asarray(tiles[idx].convert("RGB")) for idx in fallback]))
+            targets = dict(zip(fallback, map(Image.fromarray, preprocess_tile_stack(gray))))
+
+    jobs = [tesseract_pool.submit(ocr_tile, targets[idx], idx, values, preprocess == "numpy") for idx in fallback]
+    for job in jobs:
+        job.result()
 
     if -1 in values:
         raise ValueError("OCR Failed!")
 
-    return np.array(values).reshape((4, 4))
+    if use_cache:
+        glyphs = features[1]
+        for idx in pending:
+            if sources[idx] == "classifier":
+                trusted = confidences[idx] >= OCR_CONFIDENCE_THRESHOLD
+            else:
+                # Tesseract reads 0 for unreadable text too, so only a tile without any glyph pixels is empty
+                trusted = values[idx] != 0 or not glyphs[idx].any()
+            if trusted:
+                tile_cache.put(keys[idx], (values[idx], sources[idx], confidences[idx]))
+
+    return values, sources, confidences
+
+
+def recognize_board(tiles: list, engine: str = OCR_ENGINE, use_cache: bool = True,
+                    preprocess: str = PREPROCESS_MODE) -> tuple:
+    """
+    Recognizes all 16 tiles of a board with `recognize_tiles`.
+    Returns (board, sources, confidences): the 4x4 board plus the per-tile engine and confidence lists.
+    """
+    with metrics.stage("recognize"):
+        values, sources, confidences = recognize_tiles(tiles, engine, use_cache, preprocess)
+    return np.array(values).reshape((4, 4)), sources, confidences
+
+
+def ocr_board(tiles: list, engine: str = OCR_ENGINE, use_cache: bool = True,
+              preprocess: str = PREPROCESS_MODE) -> np.ndarray:
+    """
+    Recognizes all 16 tiles with the selected engine.
+    Returns the board as a 4x4 NumPy array of recognized values.
+    """
+    return recognize_board(tiles, engine, use_cache, preprocess)[0]
+
+
+def process_image_bytes(contents: bytes, engine: str = OCR_ENGINE, device_id: str = None,
+                        redetect: bool = False, preprocess: str = PREPROCESS_MODE, scale: float = 1.0) -> dict:
+    """
+    Runs the full pipeline on one screenshot (encoded image or raw framebuffer).
+    - Decodes or maps the frame, downscaled by `scale`
+    - Crops the board (using cached geometry for `device_id` unless `redetect`) and splits it into tiles
+    - Recognizes each tile with the selected engine and preprocessing mode
+    Returns the /ocr response body: the 4x4 board, the engine that decided each tile and
+    the moves that would change the board.
+    """
+    with metrics.stage("decode"):
+        img_array = decode_frame(contents, scale)
+    with metrics.stage("detect"):
+        board = load_and_crop_board_from_array(img_array, device_id, redetect)
+    with metrics.stage("split"):
+        tiles = split_into_tiles(board)
+    board_array, sources, confidences = recognize_board(tiles, engine, preprocess=preprocess)
+
+    return {
+        "board": board_array.tolist(),
+        "engines": [sources[r * 4:(r + 1) * 4] for r in range(4)],
+        "confidence": [confidences[r * 4:(r + 1) * 4] for r in range(4)],
+        "legal_moves": game_engine.legal_moves(game_engine.encode_board(board_array)),
+    }
+
+
+def process_image_bytes_timed(contents: bytes, engine: str = OCR_ENGINE, device_id: str = None,
+                              redetect: bool = False, preprocess: str = PREPROCESS_MODE, scale: float = 1.0) -> tuple:
+    """
+    Like `process_image_bytes`, but returns {"error": ...} instead of raising, together with
+    the frame's stage timings so batch workers can report them back to the server process.
+    """
+    timings = metrics.start_request_timings()
+    try:
+        return process_image_bytes(contents, engine, device_id, redetect, preprocess, scale), timings
+    except Exception as e:
+        return {"error": metrics.error_label(e)}, timings
+
+
+class OCRStreamSession:
+    """
+    Recognition state for one /ocr/stream connection, or one device's /ocr and /ocr/raw requests.
+    Keeps its own board geometry plus the last board crop's tiles and decoded values; each
+    new frame is diffed tile by tile and only tiles whose pixels changed are recognized again.
+    """
+
+    def __init__(self, engine: str = OCR_ENGINE, device_id: str = None, preprocess: str = PREPROCESS_MODE,
+                 scale: float = 1.0, change_threshold: float = 6.0):
+        self.engine = engine
+        self.device_id = device_id
+        self.preprocess = preprocess
+        self.scale = scale
+        self.change_threshold = change_threshold
+        self.redetect = False
+        self.frames = 0
+        self.unchanged_frames = 0
+        self.tiles = None  # (16, h, w, 3) pixels of the last frame's tiles
+        self.values = None
+        self.sources = None
+        self.confidences = None
+        self.geometry = BoardGeometryCache(max_entries=4)
+        # Held by a device's /ocr and /ocr/raw frames from before they are queued until they finish
+        self.request_lock = asyncio.Lock()
+
+    def configure(self, options: dict):
+        """Applies settings sent by the client as a JSON text message."""
+        if options.get("engine", self.engine) not in OCR_ENGINES:
+            raise ValueError(f"Unknown OCR engine '{options['engine']}'")
+        if options.get("preprocess", self.preprocess) not in PREPROCESS_MODES:
+            raise ValueError(f"Unknown preprocess mode '{options['preprocess']}'")
+        scale = options.get("scale", self.scale)
+        if not isinstance(scale, (int, float)) or not 0 < scale <= 1:
+            raise ValueError(SCALE_ERROR)
+        for name in ("engine", "device_id", "preprocess", "scale", "change_threshold", "redetect"):
+            if name in options:
+                setattr(self, name, options[name])
+        if options.get("reset"):
+            self.tiles = self.values = self.sources = self.confidences = None
+
+    def changed_tiles(self, tiles: np.ndarray) -> np.ndarray:
+        """Boolean mask of tiles whose strided pixel sample differs from the previous frame."""
+        if self.tiles is None or self.tiles.shape != tiles.shape:
+            return np.ones(len(tiles), dtype=bool)
+        step = max(1, tiles.shape[1] // 24)
+        current = tiles[:, ::step, ::step].astype(np.int16)
+        previous = self.tiles[:, ::step, ::step].astype(np.int16)
+        return np.abs(current - previous).mean(axis=(1, 2, 3)) > self.change_threshold
+
+    def process(self, contents: bytes) -> dict:
+        """
+        Runs one frame through the pipeline, re-recognizing only changed tiles.
+        Returns the board, a 4x4 changed-tiles mask, the "unchanged" flag and how many
+        frames in a row the board has stayed the same.
+        """
+        with metrics.stage("decode"):
+            img_array = decode_frame(contents, self.scale)
+        with metrics.stage("detect"):
+            board = load_and_crop_board_from_array(img_array, self.device_id, self.redetect, self.geometry)
+        self.redetect = False
+        with metrics.stage("split"):
+            tile_images = split_into_tiles(board)
+        tiles = np.stack([np.asarray(tile) for tile in tile_images])
+
+        changed = self.changed_tiles(tiles)
+        values = list(self.values) if self.values is not None else [0] * 16
+        sources = list(self.sources) if self.sources is not None else ["tesseract"] * 16
+        confidences = list(self.confidences) if self.confidences is not None else [1.0] * 16
+        indices = np.flatnonzero(changed).tolist()
+        if indices:
+            with metrics.stage("recognize"):
+                new_values, new_sources, new_confidences = recognize_tiles(
+                    [tile_images[idx] for idx in indices], self.engine, preprocess=self.preprocess)
+            for idx, val, source, confidence in zip(indices, new_values, new_sources, new_confidences):
+                values[idx], sources[idx], confidences[idx] = val, source, confidence
+
+        unchanged = self.values is not None and values == self.values
+        self.unchanged_frames = self.unchanged_frames + 1 if unchanged else 0
+        self.frames += 1
+        self.tiles, self.values, self.sources, self.confidences = tiles, values, sources, confidences
+
+        return {
+            "frame": self.frames,
+            "board": np.array(values).reshape((4, 4)).tolist(),
+            "changed": changed.reshape((4, 4)).tolist(),
+            "unchanged": unchanged,
+            "unchanged_frames": self.unchanged_frames,
+            "engines": [sources[r * 4:(r + 1) * 4] for r in range(4)],
+            "confidence": [confidences[r * 4:(r + 1) * 4] for r in range(4)],
+            "legal_moves": game_engine.legal_moves(game_engine.encode_board(values)),
+        }
+
+    def process_request(self, contents: bytes, engine: str, redetect: bool, preprocess: str, scale: float) -> dict:
+        """
+        Runs one /ocr or /ocr/raw frame with that request's settings.
+        Callers hold `request_lock`, since each frame of a device is diffed against the last.
+        """
+        if (engine, preprocess) != (self.engine, self.preprocess):
+            self.tiles = self.values = self.sources = self.confidences = None
+        self.engine, self.preprocess, self.scale = engine, preprocess, scale
+        self.redetect = self.redetect or redetect
+        return self.process(contents)
+
+    def info(self) -> dict:
+        return {
+            "frames": self.frames,
+            "unchanged_frames": self.unchanged_frames,
+            "geometry_hits": self.geometry.hits,
+            "geometry_misses": self.geometry.misses,
+        }
 
 
-# --- FastAPI Endpoint ---
+def _device_key(request, device_id: str = None) -> str:
+    """Scheduling key: the device id when the client sends one, otherwise the client address."""
+    return device_id or f"client:{request.client.host if request.client else 'unknown'}"
+
+
+def _busy_response(path: str, error: QueueFull) -> JSONResponse:
+    """429 with a Retry-After header for requests turned away by the scheduler."""
+    metrics.rejected_total.inc(path=path)
+    return JSONResponse(content={"error": str(error)}, status_code=429,
+                        headers={"Retry-After": str(error.retry_after)})
+
+
+async def _scheduled_ocr(key: str, contents: bytes, engine: str, device_id: str, redetect: bool,
+                         preprocess: str, scale: float) -> dict:
+    """
+    Runs one frame through the scheduler and remembers the recognized board on the device's session.
+    - Without a `device_id` the frame is processed statelessly, so anonymous frames run in parallel
+    - With one, the device's recognition session keeps its board geometry and previous tiles,
+      and its frames run one at a time, each diffed against the last
+    """
+    session = scheduler.session(key)
+    if device_id is None:
+        result = await scheduler.submit(key, process_image_bytes, contents, engine, device_id, redetect,
+                                        preprocess, scale)
+    else:
+        if session.recognition is None:
+            session.recognition = OCRStreamSession(engine, device_id, preprocess, scale)
+        # Wait for the device's previous frame before queueing, so a waiting frame never holds a worker
+        async with session.recognition.request_lock:
+            result = await scheduler.submit(key, session.recognition.process_request, contents, engine,
+                                            redetect, preprocess, scale)
+    session.last_board = result["board"]
+    return result
+
+
+# --- FastAPI Endpoints ---
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """
+    Counts requests, tracks requests in flight and records end-to-end latency per path.
+    Stage timers fill a per-request dict that becomes the Server-Timing header when SERVER_TIMING=1.
+    """
+    path = request.url.path
+    timings = metrics.start_request_timings()
+    metrics.in_flight.inc(path=path)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics.requests_total.inc(path=path, status=500)
+        raise
+    finally:
+        metrics.in_flight.dec(path=path)
+        metrics.request_seconds.observe(time.perf_counter() - start, path=path)
+    metrics.requests_total.inc(path=path, status=response.status_code)
+    if SERVER_TIMING and timings:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings)
+    return response
+
 
 @app.post("/ocr")
-async def ocr_endpoint(image: UploadFile = File(...)):
+async def ocr_endpoint(request: Request, image: UploadFile = File(...), engine: str = OCR_ENGINE,
+                       device_id: str = None, redetect: bool = False, preprocess: str = PREPROCESS_MODE,
+                       scale: float = 1.0):
     """
     API endpoint to handle 2048 board image uploads.
-    - Receives image file
-    - Crops the board and splits it into tiles
-    - Applies OCR to each tile
-    - Returns the 4x4 board as JSON
+    - Receives image file (PNG/JPEG, or a raw `screencap` framebuffer), optionally downscaled by `scale`
+    - Crops the board (cached per `device_id` or resolution; `redetect=true` forces detection)
+    - Splits it into tiles
+    - Recognizes each tile with the selected engine (query parameters `engine` and `preprocess`)
+    - Returns the 4x4 board as JSON, with the engine that decided each tile
+    The CPU-bound work is queued on the device-fair scheduler and runs in a worker thread;
+    when the queue is full the request gets a 429 with Retry-After.
     """
+    if engine not in OCR_ENGINES:
+        return JSONResponse(content={"error": f"Unknown OCR engine '{engine}'"}, status_code=400)
+    if preprocess not in PREPROCESS_MODES:
+        return JSONResponse(content={"error": f"Unknown preprocess mode '{preprocess}'"}, status_code=400)
+    if not 0 < scale <= 1:
+        return JSONResponse(content={"error": SCALE_ERROR}, status_code=400)
     try:
         contents = await image.read()
-        img_array = cv2.imdecode(np.frombuffer(contents, np.uint8), cv2.IMREAD_COLOR)
+        return await _scheduled_ocr(_device_key(request, device_id), contents, engine, device_id, redetect,
+                                    preprocess, scale)
+    except QueueFull as e:
+        return _busy_response("/ocr", e)
+    except Exception as e:
+        metrics.errors_total.inc(path="/ocr", error=metrics.error_label(e))
+        return JSONResponse(content={"error": str(e)}, status_code=500)
 
-        board = load_and_crop_board_from_array(img_array)
-        tiles = split_into_tiles(board)
-        board_array = ocr_board(tiles)
 
-        return {"board": board_array.tolist()}
+@app.post("/ocr/raw")
+async def ocr_raw_endpoint(request: Request, engine: str = OCR_ENGINE, device_id: str = None,
+                           redetect: bool = False, preprocess: str = PREPROCESS_MODE, scale: float = 1.0):
+    """
+    API endpoint for frames sent as the bare request body instead of a multipart upload.
+    Intended for piping `adb exec-out screencap` (without -p) straight through: the
+    framebuffer is mapped into NumPy without any image decode. Encoded images also work.
+    """
+    if engine not in OCR_ENGINES:
+        return JSONResponse(content={"error": f"Unknown OCR engine '{engine}'"}, status_code=400)
+    if preprocess not in PREPROCESS_MODES:
+        return JSONResponse(content={"error": f"Unknown preprocess mode '{preprocess}'"}, status_code=400)
+    if not 0 < scale <= 1:
+        return JSONResponse(content={"error": SCALE_ERROR}, status_code=400)
+    try:
+        contents = await request.body()
+        return await _scheduled_ocr(_device_key(request, device_id), contents, engine, device_id, redetect,
+                                    preprocess, scale)
+    except QueueFull as e:
+        return _busy_response("/ocr/raw", e)
     except Exception as e:
+        metrics.errors_total.inc(path="/ocr/raw", error=metrics.error_label(e))
         return JSONResponse(content={"error": str(e)}, status_code=500)
 
 
-import os
+@app.post("/ocr/batch")
+async def ocr_batch_endpoint(request: Request, images: List[UploadFile] = File(...), engine: str = OCR_ENGINE,
+                             device_id: str = None, redetect: bool = False,
+                             preprocess: str = PREPROCESS_MODE, scale: float = 1.0):
+    """
+    API endpoint to OCR many screenshots in one multipart request.
+    - Receives any number of `images` parts
+    - Queues every frame on the scheduler, which fans them out across the warm process pool
+    - Returns one result per image, in upload order; failed frames carry an "error" instead of a board
+    Batches of any size are admitted: at most `scheduler.batch_window` frames wait in the queue
+    at once, and each finished frame makes room for the next. The batch gets a 429 only if
+    that first window does not fit.
+    """
+    if engine not in OCR_ENGINES:
+        return JSONResponse(content={"error": f"Unknown OCR engine '{engine}'"}, status_code=400)
+    if preprocess not in PREPROCESS_MODES:
+        return JSONResponse(content={"error": f"Unknown preprocess mode '{preprocess}'"}, status_code=400)
+    if not 0 < scale <= 1:
+        return JSONResponse(content={"error": SCALE_ERROR}, status_code=400)
+    if process_pool is None:
+        return JSONResponse(content={"error": "OCR worker pool is not running"}, status_code=503)
+    try:
+        contents = [await image.read() for image in images]
+        key = _device_key(request, device_id)
+        window = scheduler.batch_window(len(contents))
+        scheduler.reserve(key, window)
+        slots = asyncio.Semaphore(window)
+
+        async def run_frame(data: bytes):
+            async with slots:
+                return await scheduler.enqueue(key, process_image_bytes_timed, data, engine, device_id, redetect,
+                                               preprocess, scale, executor=process_pool, reserved=True)
+
+        outcomes = await asyncio.gather(*[run_frame(data) for data in contents])
+        results = []
+        for result, timings in outcomes:
+            # Stage timings were measured in the worker process; fold them into this process's metrics
+            for name, seconds in timings.items():
+                metrics.record_stage(name, seconds)
+            if "error" in result:
+                metrics.errors_total.inc(path="/ocr/batch", error=result["error"])
+            results.append(result)
+        return {"results": results}
+    except QueueFull as e:
+        return _busy_response("/ocr/batch", e)
+    except Exception as e:
+        metrics.errors_total.inc(path="/ocr/batch", error=metrics.error_label(e))
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.websocket("/ocr/stream")
+async def ocr_stream_endpoint(websocket: WebSocket, engine: str = OCR_ENGINE, device_id: str = None,
+                              preprocess: str = PREPROCESS_MODE, scale: float = 1.0):
+    """
+    WebSocket endpoint for continuous play.
+    - Binary messages are frames (PNG/JPEG or raw framebuffer); each gets one JSON reply with the
+      board, the changed-tiles mask and an "unchanged" flag
+    - Text messages are JSON settings, e.g. {"engine": "hybrid", "redetect": true, "reset": true}
+    Errors are reported as {"error": ...} without closing the connection; frames turned away by a
+    full scheduler queue get {"error": ..., "retry_after": seconds}.
+    """
+    await websocket.accept()
+    session = OCRStreamSession(engine, device_id, preprocess, scale)
+    try:
+        session.configure({})
+    except ValueError as e:
+        await websocket.send_json({"error": str(e)})
+        await websocket.close(code=1008)
+        return
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                if message.get("bytes") is not None:
+                    key = _device_key(websocket, session.device_id)
+                    result = await scheduler.submit(key, session.process, message["bytes"])
+                    scheduler.session(key).last_board = result["board"]
+                else:
+                    session.configure(json.loads(message.get("text") or "{}"))
+                    result = {"configured": True}
+            except QueueFull as e:
+                metrics.rejected_total.inc(path="/ocr/stream")
+                result = {"error": str(e), "retry_after": e.retry_after}
+            except Exception as e:
+                metrics.errors_total.inc(path="/ocr/stream", error=metrics.error_label(e))
+                result = {"error": str(e)}
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/solve")
+async def solve_endpoint(request: Request, device_id: str = None):
+    """
+    Reference move values from the expectimax solver.
+    Body: {"board": [[...4x4 tile values...]]} or {"boards": [...]} for a batch, plus optional
+    "depth" and "time_budget_ms" (iterative deepening until the budget runs out).
+    Returns per-direction expected values (null for moves that change nothing) and the best move;
+    batches return {"results": [...]} in input order.
+    Searches are queued on the scheduler like OCR frames and run in the process pool. Without a
+    time budget the depth is capped at `solver.MAX_UNBUDGETED_DEPTH`.
+    """
+    try:
+        body = await request.json()
+        if not isinstance(body, dict):
+            return JSONResponse(content={"error": "body must be a JSON object"}, status_code=400)
+        depth = body.get("depth")
+        time_budget_ms = body.get("time_budget_ms")
+        if time_budget_ms is not None and not (
+                isinstance(time_budget_ms, (int, float)) and not isinstance(time_budget_ms, bool)
+                and 0 < time_budget_ms <= solver.MAX_TIME_BUDGET * 1000):
+            return JSONResponse(content={"error": "time_budget_ms must be a positive number of at most "
+                                                  f"{solver.MAX_TIME_BUDGET * 1000:g}"}, status_code=400)
+        max_depth = solver.MAX_DEPTH if time_budget_ms is not None else solver.MAX_UNBUDGETED_DEPTH
+        if depth is not None and not (isinstance(depth, int) and not isinstance(depth, bool)
+                                      and 1 <= depth <= max_depth):
+            message = f"depth must be an integer from 1 to {max_depth}"
+            if time_budget_ms is None:
+                message += f" (up to {solver.MAX_DEPTH} with time_budget_ms)"
+            return JSONResponse(content={"error": message}, status_code=400)
+        time_budget = time_budget_ms / 1000 if time_budget_ms is not None else None
+        boards = body.get("boards")
+        if boards is None:
+            if body.get("board") is None:
+                return JSONResponse(content={"error": "board or boards is required"}, status_code=400)
+            boards = [body["board"]]
+        if not isinstance(boards, list):
+            return JSONResponse(content={"error": "boards must be a list of 4x4 boards"}, status_code=400)
+        for board in boards:
+            solver.check_board(board)
+
+        key = _device_key(request, device_id)
+        window = scheduler.batch_window(len(boards))
+        scheduler.reserve(key, window)
+        slots = asyncio.Semaphore(window)
+
+        async def run_board(board):
+            async with slots:
+                return await scheduler.enqueue(key, solver.solve_board, board, depth, time_budget,
+                                               executor=process_pool, reserved=True)
+
+        with metrics.stage("solve"):
+            results = await asyncio.gather(*[run_board(board) for board in boards])
+        return {"results": results} if "boards" in body else results[0]
+    except QueueFull as e:
+        return _busy_response("/solve", e)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+
+@app.get("/sessions")
+def get_sessions():
+    """Returns the scheduler's worker budget, queue depth and per-device session counters."""
+    return scheduler.stats()
 
 
 @app.get("/debug/tessdata")
@@ -170,4 +1018,41 @@ def get_env():
     return {
         "tesseract_cmd": pytesseract.pytesseract.tesseract_cmd,
         "TESSDATA_PREFIX": os.environ.get("TESSDATA_PREFIX")
-    }
\ No newline at end of file
+    }
+
+
+@app.get("/debug/cache")
+def get_cache_stats():
+    """Returns tile recognition cache counters and board geometry cache hits/misses for this process."""
+    return {
+        "tile_cache": tile_cache.stats(),
+        "board_geometry": {
+            "hits": board_geometry_cache.hits,
+            "misses": board_geometry_cache.misses,
+        },
+    }
+
+
+def _cache_metrics() -> list:
+    """Exposes tile and board geometry cache counters and scheduler queue depth on /metrics."""
+    stats = tile_cache.stats()
+    lines = ["# TYPE ocr_tile_cache_events_total counter"]
+    lines += [f'ocr_tile_cache_events_total{{event="{event}"}} {stats[event]}'
+              for event in ("hits", "misses", "evictions")]
+    lines += ["# TYPE ocr_tile_cache_size gauge", f"ocr_tile_cache_size {stats['size']}"]
+    lines += ["# TYPE ocr_board_geometry_events_total counter",
+              f'ocr_board_geometry_events_total{{event="hits"}} {board_geometry_cache.hits}',
+              f'ocr_board_geometry_events_total{{event="misses"}} {board_geometry_cache.misses}']
+    lines += ["# TYPE ocr_scheduler_queued gauge", f"ocr_scheduler_queued {scheduler.queued}",
+              "# TYPE ocr_scheduler_running gauge", f"ocr_scheduler_running {scheduler.running}",
+              "# TYPE ocr_scheduler_sessions gauge", f"ocr_scheduler_sessions {len(scheduler.sessions)}"]
+    return lines
+
+
+metrics.register_collector(_cache_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text endpoint: stage latency histograms, request/error counts and requests in flight."""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
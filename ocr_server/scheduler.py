@@ -0,0 +1,175 @@
+# Import necessary libraries
+import asyncio
+import contextvars
+import math
+import time
+from collections import OrderedDict, deque
+
+# How long a device can stay silent before its session is forgotten
+SESSION_IDLE_SECONDS = 600
+
+
+class QueueFull(Exception):
+    """Raised when the work queue is at capacity; `retry_after` is a suggested wait in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("OCR server is busy, retry later")
+        self.retry_after = retry_after
+
+
+class DeviceSession:
+    """
+    Per-device bookkeeping: queued and running work, counters and the last recognized board.
+    `recognition` holds the caller's per-device pipeline state (the OCR server keeps the
+    device's board geometry and previous tiles there) and is dropped with the session.
+    """
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self.queue = deque()
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.rejected = 0
+        self.last_board = None
+        self.recognition = None
+        self.last_seen = time.time()
+
+    def info(self) -> dict:
+        return {
+            "device_id": self.device_id,
+            "queued": len(self.queue),
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "last_board": self.last_board,
+            "last_seen": self.last_seen,
+            "recognition": self.recognition.info() if self.recognition is not None else None,
+        }
+
+
+class FairScheduler:
+    """
+    Bounded, device-fair work queue in front of the CPU-bound OCR pipeline.
+    - At most `workers` jobs run at once; the rest wait in per-device FIFO queues
+    - Free worker slots go to devices in round-robin order, so a device sending bursts
+      cannot starve the others
+    - Once `max_queued` jobs are waiting, new work is rejected with QueueFull (HTTP 429)
+      instead of letting latency grow without bound
+    All state is touched only from the event loop thread, so no locks are needed.
+    """
+
+    def __init__(self, workers: int, max_queued: int):
+        self.workers = max(1, workers)
+        self.max_queued = max(0, max_queued)
+        self.sessions = OrderedDict()  # device_id -> DeviceSession; order is the round-robin order
+        self.queued = 0
+        self.running = 0
+        self.rejected = 0
+        self.completed = 0
+        self.service_seconds = 0.05  # running average of job duration, for Retry-After
+
+    def session(self, device_id: str) -> DeviceSession:
+        session = self.sessions.get(device_id)
+        if session is None:
+            session = self.sessions[device_id] = DeviceSession(device_id)
+        session.last_seen = time.time()
+        return session
+
+    def retry_after(self) -> int:
+        """Seconds until roughly one queue's worth of work has drained."""
+        backlog = self.queued + self.running
+        return max(1, math.ceil(backlog * self.service_seconds / self.workers))
+
+    def reserve(self, device_id: str, jobs: int = 1):
+        """Rejects up front if `jobs` more jobs would not fit in the queue."""
+        if self.queued + jobs > self.max_queued + max(0, self.workers - self.running):
+            self.rejected += jobs
+            self.session(device_id).rejected += jobs
+            raise QueueFull(self.retry_after())
+
+    def batch_window(self, jobs: int) -> int:
+        """
+        How many jobs of a `jobs`-long batch to keep queued at once: enough to keep every
+        worker busy, and never more than an idle scheduler could admit.
+        """
+        return max(1, min(jobs, self.workers * 2, self.workers + self.max_queued))
+
+    def enqueue(self, device_id: str, func, *args, executor=None, reserved: bool = False) -> asyncio.Future:
+        """
+        Queues `func(*args)` for `device_id` and returns a future for its result.
+        Runs in `executor` (a process pool, say), or in the default thread pool with the
+        caller's context variables so stage timings still reach the request.
+        Pass `reserved` for jobs that fill room the caller already reserved (see `batch_window`).
+        """
+        if not reserved:
+            self.reserve(device_id)
+        session = self.session(device_id)
+        future = asyncio.get_running_loop().create_future()
+        context = contextvars.copy_context() if executor is None else None
+        session.queue.append((future, func, args, executor, context))
+        session.submitted += 1
+        self.queued += 1
+        self._dispatch()
+        return future
+
+    async def submit(self, device_id: str, func, *args, executor=None):
+        """Queues `func(*args)` for `device_id` and waits for its result."""
+        return await self.enqueue(device_id, func, *args, executor=executor)
+
+    def _dispatch(self):
+        """Starts queued jobs, one device at a time in round-robin order, while worker slots are free."""
+        while self.running < self.workers and self.queued:
+            device_id, session = next((item for item in self.sessions.items() if item[1].queue), (None, None))
+            if session is None:
+                break
+            self.sessions.move_to_end(device_id)
+            future, func, args, executor, context = session.queue.popleft()
+            self.queued -= 1
+            if future.cancelled():
+                continue
+            self.running += 1
+            session.running += 1
+            asyncio.ensure_future(self._run(session, future, func, args, executor, context))
+        self._expire_sessions()
+
+    async def _run(self, session: DeviceSession, future, func, args, executor, context):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        try:
+            if context is not None:
+                result = await loop.run_in_executor(None, context.run, func, *args)
+            else:
+                result = await loop.run_in_executor(executor, func, *args)
+            if not future.cancelled():
+                future.set_result(result)
+        except Exception as e:
+            if not future.cancelled():
+                future.set_exception(e)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.service_seconds = 0.9 * self.service_seconds + 0.1 * elapsed
+            self.running -= 1
+            self.completed += 1
+            session.running -= 1
+            session.completed += 1
+            self._dispatch()
+
+    def _expire_sessions(self):
+        cutoff = time.time() - SESSION_IDLE_SECONDS
+        for device_id in [d for d, s in self.sessions.items() if s.last_seen < cutoff and not s.queue
+                          and not s.running]:
+            del self.sessions[device_id]
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "queued": self.queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "average_job_seconds": round(self.service_seconds, 4),
+            "sessions": [session.info() for session in self.sessions.values()],
+        }
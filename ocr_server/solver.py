@@ -0,0 +1,221 @@
+# Import necessary libraries
+import time
+
+import numpy as np
+
+import game_engine
+from game_engine import DIRECTIONS
+
+DEFAULT_DEPTH = 3
+MAX_DEPTH = 8
+# Deepest fixed-depth search allowed without a time budget; deeper searches must pass one
+MAX_UNBUDGETED_DEPTH = 5
+MAX_TIME_BUDGET = 10.0
+# Chance branches less likely than this are scored by the heuristic instead of searched further
+PROBABILITY_CUTOFF = 1e-4
+TRANSPOSITION_TABLE_SIZE = 1 << 18
+
+# Heuristic weights (empty cells, merges, monotonicity and tile sum), a common 2048 expectimax tuning
+LOST_PENALTY = 200000.0
+EMPTY_WEIGHT = 270.0
+MERGES_WEIGHT = 700.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+
+
+def _build_heuristic_table() -> np.ndarray:
+    """Scores every possible 16-bit row; a board's heuristic is the sum over its rows and columns."""
+    rows = np.arange(1 << 16, dtype=np.uint32)
+    cells = np.stack([(rows >> (4 * i)) & 0xF for i in range(4)], axis=1).astype(np.float64)
+
+    tile_sum = (cells ** SUM_POWER).sum(axis=1)
+    empty = (cells == 0).sum(axis=1)
+
+    merges = np.zeros(len(rows))
+    counter = np.zeros(len(rows))
+    prev = np.zeros(len(rows))
+    for i in range(4):
+        rank = cells[:, i]
+        occupied = rank != 0
+        same = occupied & (prev == rank)
+        reset = occupied & ~same
+        merges += np.where(reset & (counter > 0), 1 + counter, 0)
+        counter = np.where(same, counter + 1, np.where(reset, 0, counter))
+        prev = np.where(occupied, rank, prev)
+    merges += np.where(counter > 0, 1 + counter, 0)
+
+    powered = cells ** MONOTONICITY_POWER
+    steps = powered[:, :-1] - powered[:, 1:]
+    decreasing = cells[:, :-1] > cells[:, 1:]
+    monotonicity_left = np.where(decreasing, steps, 0).sum(axis=1)
+    monotonicity_right = np.where(decreasing, 0, -steps).sum(axis=1)
+
+    return (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges
+            - MONOTONICITY_WEIGHT * np.minimum(monotonicity_left, monotonicity_right)
+            - SUM_WEIGHT * tile_sum)
+
+
+# Plain lists: scalar indexing into them is several times faster than into NumPy arrays
+_HEURISTIC = _build_heuristic_table().tolist()
+_ROW_LEFT = game_engine.ROW_LEFT.tolist()
+_ROW_RIGHT = game_engine.ROW_RIGHT.tolist()
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when the time budget runs out."""
+
+
+class TranspositionTable:
+    """
+    Bounded board -> (remaining depth, value) map shared across iterative-deepening passes.
+    A stored value is reused when it was searched at least as deep as the current request.
+    When full, the oldest entries are dropped first.
+    """
+
+    def __init__(self, max_entries: int = TRANSPOSITION_TABLE_SIZE):
+        self.max_entries = max_entries
+        self.entries = {}
+        self.hits = 0
+
+    def get(self, board: int, depth: int):
+        entry = self.entries.get(board)
+        if entry is not None and entry[0] >= depth:
+            self.hits += 1
+            return entry[1]
+        return None
+
+    def put(self, board: int, depth: int, value: float):
+        if board not in self.entries and len(self.entries) >= self.max_entries:
+            del self.entries[next(iter(self.entries))]
+        self.entries[board] = (depth, value)
+
+
+def heuristic(board: int) -> float:
+    """Static evaluation of a packed board."""
+    transposed = game_engine.transpose(board)
+    return (_HEURISTIC[board & 0xFFFF] + _HEURISTIC[(board >> 16) & 0xFFFF]
+            + _HEURISTIC[(board >> 32) & 0xFFFF] + _HEURISTIC[board >> 48]
+            + _HEURISTIC[transposed & 0xFFFF] + _HEURISTIC[(transposed >> 16) & 0xFFFF]
+            + _HEURISTIC[(transposed >> 32) & 0xFFFF] + _HEURISTIC[transposed >> 48])
+
+
+def _slide(board: int, table: list) -> int:
+    return (table[board & 0xFFFF] | (table[(board >> 16) & 0xFFFF] << 16)
+            | (table[(board >> 32) & 0xFFFF] << 32) | (table[board >> 48] << 48))
+
+
+def successors(board: int) -> list:
+    """(direction, board after the move) for every move that changes the board, in DIRECTIONS order."""
+    transposed = game_engine.transpose(board)
+    candidates = (
+        ("LEFT", _slide(board, _ROW_LEFT)),
+        ("RIGHT", _slide(board, _ROW_RIGHT)),
+        ("UP", game_engine.transpose(_slide(transposed, _ROW_LEFT))),
+        ("DOWN", game_engine.transpose(_slide(transposed, _ROW_RIGHT))),
+    )
+    return [(direction, result) for direction, result in candidates if result != board]
+
+
+class ExpectimaxSolver:
+    """
+    Depth-limited expectimax over bit-packed boards.
+    - Move nodes take the best of the legal moves
+    - Chance nodes average over every empty cell receiving a 2 (90%) or a 4 (10%)
+    - Leaves, and chance branches below PROBABILITY_CUTOFF, are scored by `heuristic`
+    - Chance node values are memoized in a bounded transposition table
+    Depth counts moves, so depth 3 looks three player moves ahead.
+    """
+
+    def __init__(self, table_size: int = TRANSPOSITION_TABLE_SIZE):
+        self.table = TranspositionTable(table_size)
+        self.nodes = 0
+        self.deadline = None
+
+    def _move_node(self, board: int, depth: int, probability: float) -> float:
+        best = 0.0
+        for _, result in successors(board):
+            best = max(best, self._chance_node(result, depth - 1, probability))
+        return best
+
+    def _chance_node(self, board: int, depth: int, probability: float) -> float:
+        self.nodes += 1
+        if depth <= 0 or probability < PROBABILITY_CUTOFF:
+            return heuristic(board)
+        if self.deadline is not None and not self.nodes & 0xFF and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        cached = self.table.get(board, depth)
+        if cached is not None:
+            return cached
+
+        empty_shifts = [shift for shift in range(0, 64, 4) if not (board >> shift) & 0xF]
+        probability /= len(empty_shifts)
+        total = 0.0
+        for shift in empty_shifts:
+            total += 0.9 * self._move_node(board | (1 << shift), depth, probability * 0.9)
+            total += 0.1 * self._move_node(board | (2 << shift), depth, probability * 0.1)
+        value = total / len(empty_shifts)
+
+        self.table.put(board, depth, value)
+        return value
+
+    def evaluate(self, board: int, depth: int = DEFAULT_DEPTH) -> dict:
+        """Expected heuristic value of each direction at `depth`; None for moves that change nothing."""
+        values = dict.fromkeys(DIRECTIONS)
+        for direction, result in successors(board):
+            values[direction] = self._chance_node(result, depth - 1, 1.0)
+        return values
+
+    def solve(self, board: int, depth: int = None, time_budget: float = None) -> dict:
+        """
+        Scores every direction for a packed board.
+        With `time_budget` (seconds), searches depth 1, 2, ... up to `depth` (default MAX_DEPTH)
+        and returns the deepest pass that finished in time; otherwise searches `depth`
+        (default DEFAULT_DEPTH) directly.
+        """
+        start = time.perf_counter()
+        self.nodes = 0
+        if time_budget is None:
+            depth = depth or DEFAULT_DEPTH
+            values = self.evaluate(board, depth)
+        else:
+            self.deadline = start + time_budget
+            values, completed = self.evaluate(board, 1), 1
+            try:
+                for next_depth in range(2, (depth or MAX_DEPTH) + 1):
+                    values, completed = self.evaluate(board, next_depth), next_depth
+            except SearchTimeout:
+                pass
+            finally:
+                self.deadline = None
+            depth = completed
+
+        legal = {direction: value for direction, value in values.items() if value is not None}
+        return {
+            "values": values,
+            "best": max(legal, key=legal.get) if legal else None,
+            "depth": depth,
+            "nodes": self.nodes,
+            "table_hits": self.table.hits,
+            "seconds": round(time.perf_counter() - start, 6),
+        }
+
+
+def check_board(board) -> np.ndarray:
+    """Validates a 4x4 board of tile values (0 or powers of two); raises ValueError otherwise."""
+    try:
+        values = np.asarray(board)
+    except ValueError:
+        values = None  # Ragged nested lists
+    if values is None or values.shape != (4, 4) or not np.issubdtype(values.dtype, np.integer):
+        raise ValueError("board must be a 4x4 array of integers")
+    if ((values < 0) | (values == 1) | ((values & (values - 1)) != 0)).any():
+        raise ValueError("board values must be 0 or powers of two")
+    return values
+
+
+def solve_board(board, depth: int = None, time_budget: float = None) -> dict:
+    """Solves a 4x4 board of tile values with a fresh solver; picklable entry point for worker processes."""
+    return ExpectimaxSolver().solve(game_engine.encode_board(check_board(board)), depth, time_budget)
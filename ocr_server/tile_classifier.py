@@ -0,0 +1,212 @@
+# Import necessary libraries
+import json
+import os
+import sys
+
+import numpy as np
+
+# Standard 2048 tile background colors (RGB), used until the classifier is calibrated
+DEFAULT_PALETTE = {
+    0: (205, 193, 180),
+    2: (238, 228, 218),
+    4: (237, 224, 200),
+    8: (242, 177, 121),
+    16: (245, 149, 99),
+    32: (246, 124, 95),
+    64: (246, 94, 59),
+    128: (237, 207, 114),
+    256: (237, 204, 97),
+    512: (237, 200, 80),
+    1024: (237, 197, 63),
+    2048: (237, 194, 46),
+}
+
+GLYPH_SIZE = 16
+DEFAULT_TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tile_templates.npz")
+
+
+def _bin_edges(length: int, bins: int) -> np.ndarray:
+    """Returns `bins` start offsets that split `length` pixels into near-equal bins."""
+    return (np.arange(bins) * length) // bins
+
+
+class TileClassifier:
+    """
+    Recognizes 2048 tiles directly from pixels.
+    - Estimates each tile's background color from a ring just inside the tile border
+    - Builds a small glyph mask from pixels that differ from that background
+    - Scores every known value by color distance and, when calibrated, glyph template distance
+    - Returns the best value per tile together with a confidence in [0, 1]
+    """
+
+    def __init__(self, values=None, colors=None, templates=None, has_template=None,
+                 color_scale=8.0, glyph_scale=0.12, glyph_prior=0.15, max_color_distance=40.0):
+        if values is None:
+            values = list(DEFAULT_PALETTE)
+            colors = [DEFAULT_PALETTE[v] for v in values]
+        self.values = np.asarray(values, dtype=np.int64)
+        self.colors = np.asarray(colors, dtype=np.float32).reshape(len(self.values), 3)
+        if templates is None:
+            templates = np.zeros((len(self.values), GLYPH_SIZE, GLYPH_SIZE), dtype=np.float32)
+            has_template = self.values == 0  # An empty tile never has a glyph
+        self.templates = np.asarray(templates, dtype=np.float32)
+        self.has_template = np.asarray(has_template, dtype=bool)
+        self.color_scale = color_scale
+        self.glyph_scale = glyph_scale
+        self.glyph_prior = glyph_prior
+        self.max_color_distance = max_color_distance
+
+    @property
+    def calibrated(self) -> bool:
+        """True when glyph templates exist for at least one non-empty value."""
+        return bool(np.any(self.has_template & (self.values != 0)))
+
+    # --- Feature extraction ---
+
+    @staticmethod
+    def tile_features(tiles: list) -> tuple:
+        """
+        Extracts (backgrounds, glyphs) for a list of equally sized RGB tiles.
+        - backgrounds: (n, 3) median color of the ring between 12% and 22% of the tile size
+        - glyphs: (n, GLYPH_SIZE, GLYPH_SIZE) fraction of foreground pixels per cell
+        """
+        arr = np.stack([np.asarray(t.convert("RGB") if hasattr(t, "convert") else t) for t in tiles])
+        arr = arr.astype(np.float32)
+        n, h, w, _ = arr.shape
+
+        ys, xs = np.ogrid[:h, :w]
+        edge = np.minimum(np.minimum(ys, h - 1 - ys) / h, np.minimum(xs, w - 1 - xs) / w)
+        ring = (edge >= 0.12) & (edge < 0.22)
+        backgrounds = np.median(arr[:, ring], axis=1)
+
+        # Glyph pixels are the ones far from the tile background, inside the border margin
+        top, bottom, left, right = int(h * 0.15), int(h * 0.85), int(w * 0.15), int(w * 0.85)
+        inner = arr[:, top:bottom, left:right]
+        distance = np.linalg.norm(inner - backgrounds[:, None, None, :], axis=-1)
+        mask = (distance > 48).astype(np.float32)
+
+        ih, iw = mask.shape[1:]
+        rows, cols = _bin_edges(ih, GLYPH_SIZE), _bin_edges(iw, GLYPH_SIZE)
+        counts = np.diff(np.append(rows, ih))[:, None] * np.diff(np.append(cols, iw))[None, :]
+        glyphs = np.add.reduceat(np.add.reduceat(mask, rows, axis=1), cols, axis=2) / counts
+        return backgrounds, glyphs.astype(np.float32)
+
+    # --- Classification ---
+
+    def classify_features(self, backgrounds: np.ndarray, glyphs: np.ndarray) -> tuple:
+        """
+        Scores every candidate value for every tile in one batched operation.
+        Returns (values, confidences) as NumPy arrays of length n.
+        """
+        color_dist = np.linalg.norm(backgrounds[:, None, :] - self.colors[None, :, :], axis=-1)
+        glyph_dist = np.abs(glyphs[:, None] - self.templates[None]).mean(axis=(2, 3))
+        glyph_dist = np.where(self.has_template[None, :], glyph_dist, self.glyph_prior)
+
+        log_score = -(color_dist / self.color_scale) ** 2 - (glyph_dist / self.glyph_scale) ** 2
+        log_score -= log_score.max(axis=1, keepdims=True)
+        probs = np.exp(log_score)
+        probs /= probs.sum(axis=1, keepdims=True)
+
+        best = probs.argmax(axis=1)
+        confidences = probs[np.arange(len(best)), best]
+        # Unknown themes or overlays: the nearest color is still far away, so don't trust it
+        nearest = color_dist[np.arange(len(best)), best]
+        confidences = np.where(nearest > self.max_color_distance, 0.0, confidences)
+        return self.values[best], confidences
+
+    def classify_tiles(self, tiles: list) -> tuple:
+        """Classifies a list of tiles (PIL images or RGB arrays); returns (values, confidences)."""
+        if not tiles:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        return self.classify_features(*self.tile_features(tiles))
+
+    # --- Calibration ---
+
+    @classmethod
+    def calibrate(cls, samples, **kwargs) -> "TileClassifier":
+        """
+        Builds a classifier from labelled boards.
+        `samples` yields (tiles, labels) pairs: 16 tiles and their 16 known values.
+        Background colors and glyph templates are averaged per value; values never
+        seen in the samples keep their default palette color and no template.
+        """
+        color_sums, glyph_sums, counts = {}, {}, {}
+        for tiles, labels in samples:
+            backgrounds, glyphs = cls.tile_features(tiles)
+            for value, bg, glyph in zip(np.asarray(labels).ravel().tolist(), backgrounds, glyphs):
+                color_sums[value] = color_sums.get(value, 0) + bg
+                glyph_sums[value] = glyph_sums.get(value, 0) + glyph
+                counts[value] = counts.get(value, 0) + 1
+
+        values = sorted(set(DEFAULT_PALETTE) | set(counts))
+        colors, templates, has_template = [], [], []
+        for value in values:
+            if value in counts:
+                colors.append(color_sums[value] / counts[value])
+                templates.append(glyph_sums[value] / counts[value])
+                has_template.append(True)
+            else:
+                colors.append(DEFAULT_PALETTE[value])
+                templates.append(np.zeros((GLYPH_SIZE, GLYPH_SIZE), dtype=np.float32))
+                has_template.append(value == 0)
+        return cls(values, colors, np.stack(templates), has_template, **kwargs)
+
+    def save(self, path: str = DEFAULT_TEMPLATES_PATH):
+        """Writes the calibrated palette and templates to an .npz file."""
+        np.savez_compressed(path, values=self.values, colors=self.colors,
+                            templates=self.templates, has_template=self.has_template)
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_TEMPLATES_PATH, **kwargs) -> "TileClassifier":
+        """Loads a calibrated classifier, or the default palette classifier if `path` doesn't exist."""
+        if not path or not os.path.exists(path):
+            return cls(**kwargs)
+        data = np.load(path)
+        return cls(data["values"], data["colors"], data["templates"], data["has_template"], **kwargs)
+
+
+# --- Calibration CLI ---
+
+def main(argv: list) -> int:
+    """
+    Calibrates glyph templates from labelled screenshots.
+    Usage: python tile_classifier.py labels.jsonl [output.npz]
+    Each line of labels.jsonl is {"image": "<path>", "board": [[...4x4 values...]]};
+    image paths are resolved relative to the labels file.
+    """
+    import cv2
+    from ocr_api import load_and_crop_board_from_array, split_into_tiles
+
+    if len(argv) < 2:
+        print(main.__doc__)
+        return 1
+    labels_path = argv[1]
+    output_path = argv[2] if len(argv) > 2 else DEFAULT_TEMPLATES_PATH
+    base_dir = os.path.dirname(os.path.abspath(labels_path))
+
+    def samples():
+        with open(labels_path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                img_array = cv2.imread(os.path.join(base_dir, entry["image"]), cv2.IMREAD_COLOR)
+                if img_array is None:
+                    print(f"Warning: Skipping unreadable image: {entry['image']}")
+                    continue
+                try:
+                    tiles = split_into_tiles(load_and_crop_board_from_array(img_array))
+                except ValueError as e:
+                    print(f"Warning: Skipping {entry['image']}: {e}")
+                    continue
+                yield tiles, entry["board"]
+
+    classifier = TileClassifier.calibrate(samples())
+    classifier.save(output_path)
+    print(f"Calibrated values: {classifier.values[classifier.has_template].tolist()}")
+    print(f"Templates saved to: {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
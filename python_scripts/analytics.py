@@ -0,0 +1,343 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+STRATEGIES = ["topLeft", "topRight", "bottomLeft", "bottomRight"]
+SIMILARITY_COLS = ["similarity_overall", "left", "right", "up", "down"]
+MANIFEST_FILENAME = ".manifest.json"
+# Bump when a renderer changes so every figure is redrawn once
+RENDER_VERSION = 1
+
+
+def _logs_path(*parts):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, "..", "server", "logs", *parts))
+
+
+# --- Data loading ---
+
+def _source_stamp(csv_path):
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_frame(csv_path, cache_path):
+    """
+    Loads data.csv as a frame indexed by run type.
+    The parsed columns are cached in an .npz next to the CSV and reused until the CSV
+    changes, so repeated report runs skip CSV parsing entirely. When a type appears more
+    than once, the first row wins, as in the original scripts.
+    """
+    stamp = _source_stamp(csv_path)
+    if os.path.exists(cache_path):
+        with np.load(cache_path, allow_pickle=False) as data:
+            if str(data["__source__"]) == stamp:
+                columns = [name for name in data.files if name not in ("__source__", "type")]
+                return pd.DataFrame({name: data[name] for name in columns},
+                                    index=pd.Index(data["type"], name="type"))
+
+    df = pd.read_csv(csv_path, skipinitialspace=True)
+    df.columns = df.columns.str.strip()
+    df["type"] = df["type"].astype(str).str.strip()
+    df = df.drop_duplicates("type").set_index("type")
+    df = df.apply(pd.to_numeric, errors="coerce")
+
+    tmp_path = cache_path + ".tmp.npz"
+    np.savez(tmp_path, __source__=np.array(stamp), type=df.index.to_numpy(dtype=str),
+             **{name: df[name].to_numpy(dtype=np.float64) for name in df.columns})
+    os.replace(tmp_path, cache_path)
+    return df
+
+
+# --- Renderers ---
+# Each renderer receives {type: {column: value}} for the rows it declared and an output path.
+
+def render_strategy_vs_dry(rows, path):
+    strategy = next(name for name in rows if name != "dry")
+    dry_row, strategy_row = rows["dry"], rows[strategy]
+    width = 0.35
+
+    plt.figure(figsize=(12, 10))
+
+    # a) Similarity scores comparison
+    plt.subplot(2, 1, 1)
+    x = np.arange(len(SIMILARITY_COLS))
+    plt.bar(x - width/2, [dry_row[col] for col in SIMILARITY_COLS], width, label='dry')
+    plt.bar(x + width/2, [strategy_row[col] for col in SIMILARITY_COLS], width, label=strategy)
+    plt.xlabel('Metrics')
+    plt.ylabel('Similarity Score')
+    plt.title(f'Similarity Scores Comparison: {strategy} vs Dry Run')
+    plt.xticks(x, SIMILARITY_COLS)
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # b) Direction percentages comparison
+    plt.subplot(2, 1, 2)
+    direction_cols = ['right_percentage', 'left_percentage', 'up_percentage', 'down_percentage']
+    x = np.arange(len(direction_cols))
+    plt.bar(x - width/2, [dry_row[col] for col in direction_cols], width, label='dry')
+    plt.bar(x + width/2, [strategy_row[col] for col in direction_cols], width, label=strategy)
+    plt.xlabel('Directions')
+    plt.ylabel('Percentage')
+    plt.title(f'Direction Percentages Comparison: {strategy} vs Dry Run')
+    plt.xticks(x, [col.split('_')[0].upper() for col in direction_cols])
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def render_radar_charts(rows, path):
+    dry_row = rows["dry"]
+    categories = ['Left', 'Right', 'Up', 'Down']
+    angles = [n / float(len(categories)) * 2 * np.pi for n in range(len(categories))]
+    angles += angles[:1]  # Close the loop
+
+    plt.figure(figsize=(20, 15))
+    for i, strategy in enumerate(STRATEGIES, 1):
+        strategy_row = rows[strategy]
+        dry_values = [dry_row[category.lower()] for category in categories]
+        strategy_values = [strategy_row[category.lower()] for category in categories]
+        dry_values += dry_values[:1]
+        strategy_values += strategy_values[:1]
+
+        ax = plt.subplot(2, 2, i, polar=True)
+        ax.plot(angles, dry_values, 'o-', linewidth=2, label='dry')
+        ax.fill(angles, dry_values, alpha=0.25)
+        ax.plot(angles, strategy_values, 'o-', linewidth=2, label=strategy)
+        ax.fill(angles, strategy_values, alpha=0.25)
+        ax.set_thetagrids(np.degrees(angles[:-1]), categories)
+        ax.set_title(f'Similarity Comparison: {strategy} vs Dry Run')
+        ax.grid(True)
+        plt.legend(loc='upper right')
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def render_direction_percentages(rows, path):
+    directions = ['RIGHT', 'LEFT', 'UP', 'DOWN']
+    colors = {'RIGHT': 'red', 'LEFT': 'blue', 'UP': 'green', 'DOWN': 'purple'}
+    types = ['dry'] + STRATEGIES
+    bar_width = 0.15
+    index = np.arange(len(types))
+
+    plt.figure(figsize=(15, 10))
+    for i, direction in enumerate(directions):
+        col = direction.lower() + '_percentage'
+        values = [rows[name][col] for name in types]
+        plt.bar(index + i * bar_width, values, bar_width, label=direction, color=colors[direction])
+
+    plt.xlabel('Strategy')
+    plt.ylabel('Percentage')
+    plt.title('Direction Percentages Across All Strategies')
+    plt.xticks(index + bar_width * 1.5, types)
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def _topleft_bars(x, topleft_values, topleft4o_values, width):
+    plt.bar(x - width/2, topleft_values, width, label='GPT-4o-mini', color='skyblue')
+    plt.bar(x + width/2, topleft4o_values, width, label='GPT-4o', color='orangered')
+
+
+def render_topleft_vs_topleft4o(rows, path):
+    topleft_row, topleft4o_row = rows["topLeft"], rows["topLeft4o"]
+    directions = ['left', 'right', 'up', 'down']
+    percentage_cols = ['left_percentage', 'right_percentage', 'up_percentage', 'down_percentage']
+    x = np.arange(len(directions))
+    width = 0.35
+
+    plt.figure(figsize=(12, 8))
+
+    plt.subplot(2, 1, 1)
+    _topleft_bars(x, [topleft_row[d] for d in directions], [topleft4o_row[d] for d in directions], width)
+    plt.ylabel('Similarity Score')
+    plt.title('Direction Similarity Scores: topLeft vs topLeft4o')
+    plt.xticks(x, [d.upper() for d in directions])
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    plt.subplot(2, 1, 2)
+    _topleft_bars(x, [topleft_row[col] for col in percentage_cols],
+                  [topleft4o_row[col] for col in percentage_cols], width)
+    plt.xlabel('Direction')
+    plt.ylabel('Percentage (%)')
+    plt.title('Direction Percentages: topLeft vs topLeft4o')
+    plt.xticks(x, [col.split('_')[0].upper() for col in percentage_cols])
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def render_topleft_comprehensive(rows, path):
+    topleft_row, topleft4o_row = rows["topLeft"], rows["topLeft4o"]
+    x_all = np.arange(len(SIMILARITY_COLS))
+    width = 0.35
+    topleft_all_scores = [topleft_row[metric] for metric in SIMILARITY_COLS]
+    topleft4o_all_scores = [topleft4o_row[metric] for metric in SIMILARITY_COLS]
+
+    plt.figure(figsize=(14, 10))
+    _topleft_bars(x_all, topleft_all_scores, topleft4o_all_scores, width)
+    plt.xlabel('Metric')
+    plt.ylabel('Similarity Score')
+    plt.title('Comprehensive Comparison: topLeft vs topLeft4o Similarity Scores')
+    plt.xticks(x_all, ['OVERALL'] + [metric.upper() for metric in SIMILARITY_COLS[1:]])
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Add value labels on top of each bar
+    for i, v in enumerate(topleft_all_scores):
+        plt.text(i - width/2, v + 0.01, f'{v:.4f}', ha='center', va='bottom', fontsize=9, rotation=45)
+    for i, v in enumerate(topleft4o_all_scores):
+        plt.text(i + width/2, v + 0.01, f'{v:.4f}', ha='center', va='bottom', fontsize=9, rotation=45)
+
+    plt.tight_layout()
+    plt.savefig(path)
+    plt.close()
+
+
+def render_topleft_percentages(rows, path):
+    topleft_row, topleft4o_row = rows["topLeft"], rows["topLeft4o"]
+    percentage_cols = ['left_percentage', 'right_percentage', 'up_percentage', 'down_percentage']
+    x_perc = np.arange(len(percentage_cols))
+    bar_width = 0.35
+    topleft_percentages = [topleft_row[col] for col in percentage_cols]
+    topleft4o_percentages = [topleft4o_row[col] for col in percentage_cols]
+
+    plt.figure(figsize=(10, 8))
+    _topleft_bars(x_perc, topleft_percentages, topleft4o_percentages, bar_width)
+    plt.xlabel('Direction')
+    plt.ylabel('Percentage (%)')
+    plt.title('Direction Distribution Comparison: topLeft vs topLeft4o')
+    plt.xticks(x_perc, [col.split('_')[0].upper() for col in percentage_cols])
+    plt.legend()
+    plt.grid(axis='y', linestyle='--', alpha=0.7)
+
+    # Add value labels on top of each bar
+    for i, v in enumerate(topleft_percentages):
+        plt.text(i - bar_width/2, v + 1, f'{v:.2f}%', ha='center', va='bottom')
+    for i, v in enumerate(topleft4o_percentages):
+        plt.text(i + bar_width/2, v + 1, f'{v:.2f}%', ha='center', va='bottom')
+
+    # Add a subtitle explaining the difference
+    plt.figtext(0.5, 0.01,
+                f"Overall Similarity: topLeft = {topleft_row['similarity_overall']:.4f}, "
+                f"topLeft4o = {topleft4o_row['similarity_overall']:.4f}",
+                ha="center", fontsize=10, bbox={"facecolor": "lightgray", "alpha": 0.5, "pad": 5})
+
+    plt.tight_layout(rect=[0, 0.05, 1, 0.95])
+    plt.savefig(path)
+    plt.close()
+
+
+# Every figure: output filename -> (group, renderer, run types it reads)
+FIGURES = {
+    **{f"{strategy}_vs_dry.png": ("strategies", render_strategy_vs_dry, ["dry", strategy])
+       for strategy in STRATEGIES},
+    "radar_charts.png": ("strategies", render_radar_charts, ["dry"] + STRATEGIES),
+    "direction_percentages_by_strategy.png": ("strategies", render_direction_percentages, ["dry"] + STRATEGIES),
+    "topleft_vs_topleft4o.png": ("topleft", render_topleft_vs_topleft4o, ["topLeft", "topLeft4o"]),
+    "topleft_vs_topleft4o_comprehensive.png": ("topleft", render_topleft_comprehensive, ["topLeft", "topLeft4o"]),
+    "topleft_vs_topleft4o_percentages.png": ("topleft", render_topleft_percentages, ["topLeft", "topLeft4o"]),
+}
+
+
+# --- Report ---
+
+def figure_digest(filename, rows):
+    """Hashes a figure's input rows, so it is only redrawn when those rows change."""
+    payload = json.dumps([RENDER_VERSION, filename, rows], sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _render(filename, rows, output_dir):
+    FIGURES[filename][1](rows, os.path.join(output_dir, filename))
+    return filename
+
+
+def generate_report(groups=None, force=False, workers=None, csv_path=None, output_dir=None):
+    """
+    Renders every figure whose input rows changed since the last run, in parallel.
+    Returns (rendered, skipped_unchanged, skipped_missing) lists of filenames.
+    """
+    csv_path = csv_path or _logs_path("data.csv")
+    output_dir = output_dir or _logs_path("graphs")
+    os.makedirs(output_dir, exist_ok=True)
+    df = load_frame(csv_path, os.path.splitext(csv_path)[0] + "_cache.npz")
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    manifest = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+
+    pending, unchanged, missing = {}, [], []
+    for filename, (group, _, types) in FIGURES.items():
+        if groups and group not in groups:
+            continue
+        absent = [name for name in types if name not in df.index]
+        if absent:
+            print(f"Warning: Skipping {filename}; no rows for {', '.join(absent)} in {csv_path}")
+            missing.append(filename)
+            continue
+        rows = {name: {col: float(value) for col, value in df.loc[name].items()} for name in types}
+        digest = figure_digest(filename, rows)
+        if manifest.get(filename) == digest and os.path.exists(os.path.join(output_dir, filename)):
+            unchanged.append(filename)
+        else:
+            pending[filename] = (rows, digest)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers or min(len(pending), os.cpu_count() or 1)) as pool:
+            futures = {filename: pool.submit(_render, filename, rows, output_dir)
+                       for filename, (rows, _) in pending.items()}
+            for filename, future in futures.items():
+                future.result()
+                manifest[filename] = pending[filename][1]
+
+        tmp_path = manifest_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
+
+    return list(pending), unchanged, missing
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the data.csv comparison figures.")
+    parser.add_argument("--group", dest="groups", action="append", choices=sorted({g for g, _, _ in FIGURES.values()}),
+                        help="only render this group of figures (repeatable); default is all")
+    parser.add_argument("--force", action="store_true", help="redraw every figure even if its inputs are unchanged")
+    parser.add_argument("--workers", type=int, help="number of render processes (default: one per figure, up to CPUs)")
+    parser.add_argument("--csv", dest="csv_path", help="path to data.csv (default: server/logs/data.csv)")
+    parser.add_argument("--output-dir", help="where to write figures (default: server/logs/graphs)")
+    args = parser.parse_args(argv)
+
+    rendered, unchanged, missing = generate_report(args.groups, args.force, args.workers,
+                                                   args.csv_path, args.output_dir)
+    output_dir = args.output_dir or _logs_path("graphs")
+    print(f"Rendered {len(rendered)} graphs to {output_dir} "
+          f"({len(unchanged)} unchanged, {len(missing)} skipped for missing data)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,148 @@
+import argparse
+import hashlib
 import json
 import os
 
-def generate_centroid():
+import numpy as np
 
+CHUNK_ROWS = 4096
+HEAD_BYTES = 4096
+
+
+def _public_path(filename):
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    embeddings_filename = "embeddings_fixed.jsonl"
-    embeddings_path = os.path.join(script_dir, "..", "server", "public", embeddings_filename)
-    embeddings_path = os.path.normpath(embeddings_path)
+    return os.path.normpath(os.path.join(script_dir, "..", "server", "public", filename))
+
+
+def _head_digest(path, length):
+    """Hashes the first `length` bytes of a file so a rewritten file can be told apart from an appended one."""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(min(length, HEAD_BYTES)), digest_size=16).hexdigest()
+
+
+def load_state(state_path):
+    """Loads the running sum, count and file offset from a previous run, or None."""
+    if not os.path.exists(state_path):
+        return None
+    with np.load(state_path) as data:
+        return {
+            "sum": data["sum"],
+            "count": int(data["count"]),
+            "offset": int(data["offset"]),
+            "dim": int(data["dim"]),
+            "dtype": str(data["dtype"]),
+            "head_digest": str(data["head_digest"]),
+        }
+
+
+def save_state(state_path, state):
+    np.savez(state_path, sum=state["sum"], count=state["count"], offset=state["offset"],
+             dim=state["dim"], dtype=state["dtype"], head_digest=state["head_digest"])
+
+
+def parse_embedding(line, dtype):
+    """Parses one `[a, b, ...]` line into a 1-D array, or None if it isn't a plain number list."""
+    text = line.strip()
+    if not (text.startswith(b"[") and text.endswith(b"]")):
+        return None
+    values = np.fromstring(text[1:-1].decode("ascii"), dtype=dtype, sep=",")
+    return values if values.size else None
+
+
+def accumulate(embeddings_path, state, dtype="float64", chunk_rows=CHUNK_ROWS):
+    """
+    Folds every complete line after `state["offset"]` into the running sum.
+    Lines are parsed into a fixed (chunk_rows, dim) buffer and reduced one chunk at a
+    time, so memory stays constant however large the file is. A trailing line without a
+    newline is left for the next run, since the writer may still be appending to it.
+    """
+    skipped = 0
+    buffer = None
+    filled = 0
+
+    def flush():
+        state["sum"] += buffer[:filled].sum(axis=0, dtype=np.float64)
+        state["count"] += filled
+
+    with open(embeddings_path, "rb") as f:
+        f.seek(state["offset"])
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            state["offset"] += len(line)
+            if not line.strip():
+                continue
+            try:
+                embedding = parse_embedding(line, dtype)
+            except (ValueError, UnicodeDecodeError):
+                embedding = None
+            if embedding is None or (state["dim"] and embedding.size != state["dim"]):
+                print(f"Warning: Skipping invalid embedding line: {line[:80].decode(errors='replace').strip()}...")
+                skipped += 1
+                continue
+            if not state["dim"]:
+                state["dim"] = embedding.size
+                state["sum"] = np.zeros(state["dim"], dtype=np.float64)
+            if buffer is None:
+                buffer = np.empty((chunk_rows, state["dim"]), dtype=dtype)
+            buffer[filled] = embedding
+            filled += 1
+            if filled == chunk_rows:
+                flush()
+                filled = 0
+    if filled:
+        flush()
+    return skipped
+
+
+def generate_centroid(full=False, dtype="float64", embeddings_filename="embeddings_fixed.jsonl",
+                      centroid_filename="centroid.jsonl", state_filename="centroid_state.npz"):
+    """
+    Computes the mean embedding and writes it to server/public/centroid.jsonl.
+    The running sum, count, byte offset, dimensionality and float precision are persisted
+    next to it, so later runs only read embeddings appended since the last run. A full
+    recompute happens with `full=True`, when the file was truncated or rewritten, or when
+    the requested precision differs from the stored one.
+    """
+    embeddings_path = _public_path(embeddings_filename)
+    state_path = _public_path(state_filename)
 
     print("Trying to open:", embeddings_path)
-    try:
-        with open(embeddings_path, "r") as f:
-            sum_vector = [0] * 1536
-            count = 0
-            for line in f:
-                try:
-                    embedding = json.loads(line.strip())
-                    sum_vector = [sum_vector[i] + embedding[i] for i in range(1536)]
-                    count += 1
-                except json.JSONDecodeError as json_err:
-                    print(f"Warning: Skipping invalid JSON line: {line.strip()}. Error: {json_err}")
-                except Exception as e:
-                    print(f"Warning: Skipping line due to unexpected error: {line.strip()}. Error: {e}")
-            centroid = [x / count for x in sum_vector]
-            print(f"Successfully generated centroid from {count} embeddings.")
-            centroid_filename = "centroid.jsonl"
-            centroid_path = os.path.join(script_dir, "..", "server", "public", centroid_filename)
-            with open(centroid_path, "w") as centroid_file: 
-                json.dump(centroid, centroid_file)
-    except FileNotFoundError:
+    if not os.path.exists(embeddings_path):
         print(f"Error: Embeddings file not found at the calculated path: {embeddings_path}")
+        return
+
+    state = None if full else load_state(state_path)
+    if state is not None:
+        size = os.path.getsize(embeddings_path)
+        if (state["offset"] > size or state["dtype"] != dtype
+                or _head_digest(embeddings_path, state["offset"]) != state["head_digest"]):
+            print("Embeddings file was rewritten or settings changed; recomputing from the start.")
+            state = None
+    if state is None:
+        state = {"sum": np.zeros(0, dtype=np.float64), "count": 0, "offset": 0, "dim": 0, "dtype": dtype,
+                 "head_digest": ""}
+
+    previous_count = state["count"]
+    skipped = accumulate(embeddings_path, state, dtype)
+    state["head_digest"] = _head_digest(embeddings_path, state["offset"])
+    save_state(state_path, state)
+
+    if not state["count"]:
+        print("No valid embeddings found; centroid not written.")
+        return
+
+    centroid = state["sum"] / state["count"]
+    print(f"Folded in {state['count'] - previous_count} new embeddings ({skipped} skipped); "
+          f"centroid of {state['count']} embeddings, dim {state['dim']}, {state['dtype']}.")
+    with open(_public_path(centroid_filename), "w") as centroid_file:
+        json.dump(centroid.astype(dtype).tolist(), centroid_file)
+
 
 if __name__ == "__main__":
-    generate_centroid()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Incrementally compute the embedding centroid.")
+    parser.add_argument("--full", action="store_true", help="ignore saved state and reread the whole file")
+    parser.add_argument("--dtype", choices=["float32", "float64"], default="float64",
+                        help="precision embeddings are parsed at (sums are always float64)")
+    args = parser.parse_args()
+    generate_centroid(full=args.full, dtype=args.dtype)
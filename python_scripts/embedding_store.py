@@ -0,0 +1,261 @@
+import argparse
+import json
+import os
+import struct
+
+import numpy as np
+
+from fix_embeddings_format import to_json_array
+
+MAGIC = b"EMBSTORE"
+VERSION = 1
+# magic, version, dimensionality, bytes per value; padded to a fixed 32-byte header
+HEADER = struct.Struct("<8sIII12x")
+DTYPE = np.dtype("<f4")
+
+
+def _public_path(filename):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, "..", "server", "public", filename))
+
+
+class EmbeddingStore:
+    """Append-only float32 embedding matrix with a sidecar row index.
+
+       `<path>` holds a 32-byte header followed by row-major float32 rows, so the whole
+       matrix can be memory-mapped in O(1). `<path>.index.jsonl` holds one line per row
+       with its row id, timestamp and prompt. A partial row left by an interrupted append is
+       cut off when the store is opened.
+    """
+
+    def __init__(self, path, dim=None):
+        self.path = path
+        self.index_path = path + ".index.jsonl"
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+            with open(path, "rb") as f:
+                magic, version, stored_dim, itemsize = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != VERSION or itemsize != DTYPE.itemsize:
+                raise ValueError(f"{path} is not a version {VERSION} embedding store")
+            if dim is not None and dim != stored_dim:
+                raise ValueError(f"{path} stores {stored_dim}-d embeddings, not {dim}-d")
+            self.dim = stored_dim
+            partial = (os.path.getsize(path) - HEADER.size) % (stored_dim * DTYPE.itemsize)
+            if partial:
+                os.truncate(path, os.path.getsize(path) - partial)
+        else:
+            self.dim = dim
+
+    def __len__(self):
+        if not self.dim or not os.path.exists(self.path):
+            return 0
+        return (os.path.getsize(self.path) - HEADER.size) // (self.dim * DTYPE.itemsize)
+
+    def _create(self, dim):
+        self.dim = dim
+        with open(self.path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, dim, DTYPE.itemsize))
+        open(self.index_path, "w").close()
+
+    def append(self, embeddings, timestamps=None, prompts=None, lines=None):
+        """Appends a batch of embeddings (n x dim) and their index entries; returns the new row ids.
+           `lines` are the rows' 0-based line numbers in the source JSONL file, which the server
+           logs with each move as `embedding_line`.
+        """
+        rows = np.atleast_2d(np.asarray(embeddings, dtype=DTYPE))
+        if not os.path.exists(self.path) or os.path.getsize(self.path) < HEADER.size:
+            self._create(self.dim or rows.shape[1])
+        if rows.shape[1] != self.dim:
+            raise ValueError(f"Expected {self.dim}-d embeddings, got {rows.shape[1]}-d")
+
+        start = len(self)
+        with open(self.path, "ab") as f:
+            f.write(rows.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_path, "a") as f:
+            for i in range(len(rows)):
+                f.write(json.dumps({
+                    "row": start + i,
+                    "timestamp": timestamps[i] if timestamps is not None else None,
+                    "prompt": prompts[i] if prompts is not None else None,
+                    "line": lines[i] if lines is not None else None,
+                }) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return list(range(start, start + len(rows)))
+
+    def truncate(self, rows):
+        """Drops every row from `rows` on, along with their index entries."""
+        os.truncate(self.path, HEADER.size + rows * self.dim * DTYPE.itemsize)
+        if not os.path.exists(self.index_path):
+            return
+        kept = 0
+        with open(self.index_path, "rb") as f:
+            for _ in range(rows):
+                line = f.readline()
+                if not line:
+                    break
+                kept += len(line)
+        os.truncate(self.index_path, kept)
+
+    def matrix(self):
+        """Read-only (rows x dim) memory map of every embedding; nothing is parsed or copied."""
+        rows = len(self)
+        if not rows:
+            return np.zeros((0, self.dim or 0), dtype=DTYPE)
+        return np.memmap(self.path, dtype=DTYPE, mode="r", offset=HEADER.size, shape=(rows, self.dim))
+
+    def index(self):
+        """Returns the sidecar index entries as a list of dicts, in row order."""
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path, "r") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+def _append_lines(store, infile, batch_rows=1024, first_line=0, on_flush=None):
+    """Appends every complete line of `infile` (from its current position, line `first_line`)
+       to `store`. Returns (rows written, lines skipped, bytes consumed, lines consumed); a
+       trailing line without a newline is left for the next run, since the writer may still
+       be appending to it. `on_flush(bytes consumed, lines consumed)` is called after every
+       batch is written.
+    """
+    batch, line_numbers, written, skipped, consumed = [], [], 0, 0, 0
+    line_number = first_line
+
+    def flush():
+        nonlocal written
+        if batch:
+            store.append(np.stack(batch), lines=line_numbers)
+            written += len(batch)
+            batch.clear()
+            line_numbers.clear()
+            if on_flush is not None:
+                on_flush(consumed, line_number - first_line)
+
+    for raw_line in infile:
+        if not raw_line.endswith(b"\n"):
+            break
+        consumed += len(raw_line)
+        line_number += 1
+        stripped_line = raw_line.decode("utf-8", "replace").strip()
+        array_text = to_json_array(stripped_line) if stripped_line else None
+        if array_text is None:
+            skipped += 1
+            continue
+        try:
+            values = np.fromstring(array_text[1:-1], dtype=DTYPE, sep=",")
+        except ValueError:
+            values = np.zeros(0, dtype=DTYPE)
+        expected_dim = store.dim or (batch[0].size if batch else values.size)
+        if not values.size or values.size != expected_dim:
+            print(f"Warning: Skipping malformed embedding line: {stripped_line[:80]}...")
+            skipped += 1
+            continue
+        batch.append(values)
+        line_numbers.append(line_number - 1)
+        if len(batch) == batch_rows:
+            flush()
+    flush()
+    return written, skipped, consumed, line_number - first_line
+
+
+def _save_source(store_path, input_path, offset, lines, rows):
+    """Atomically records how much of `input_path` is ingested and how many store rows that made."""
+    source_path = store_path + ".source.json"
+    with open(source_path + ".tmp", "w") as f:
+        json.dump({"source": os.path.abspath(input_path), "offset": offset, "lines": lines, "rows": rows}, f)
+    os.replace(source_path + ".tmp", source_path)
+
+
+def convert_jsonl(input_path, store_path, batch_rows=1024):
+    """One-shot conversion of an embeddings JSONL file into an EmbeddingStore.
+       Accepts the same line variants as fix_embeddings_format: `[...]`, `{[...]}` and
+       bare comma-separated numbers. The store is built under a temporary name and renamed
+       into place at the end, so a failed conversion never leaves a partial store behind.
+       Returns (rows written, lines skipped).
+    """
+    tmp_path = store_path + ".tmp"
+    for path in (tmp_path, tmp_path + ".index.jsonl"):
+        if os.path.exists(path):
+            os.remove(path)
+    store = EmbeddingStore(tmp_path)
+    with open(input_path, "rb") as infile:
+        written, skipped, consumed, lines = _append_lines(store, infile, batch_rows)
+    if not written:
+        for path in (tmp_path, tmp_path + ".index.jsonl"):
+            if os.path.exists(path):
+                os.remove(path)
+        return written, skipped
+    os.replace(tmp_path + ".index.jsonl", store_path + ".index.jsonl")
+    os.replace(tmp_path, store_path)
+    _save_source(store_path, input_path, consumed, lines, written)
+    return written, skipped
+
+
+def update_jsonl(input_path, store_path, batch_rows=1024):
+    """Appends the lines added to `input_path` since the last convert or update.
+       The byte offset already ingested and the row count it produced are kept in
+       `<store>.source.json`, saved after every batch. Rows appended after the last save
+       (by a run that crashed) are dropped and read again. Creates the store when there
+       is none yet. Returns (rows written, lines skipped).
+    """
+    source_path = store_path + ".source.json"
+    if not os.path.exists(store_path) or not os.path.exists(source_path):
+        return convert_jsonl(input_path, store_path, batch_rows)
+    with open(source_path, "r") as f:
+        source = json.load(f)
+    if source["source"] != os.path.abspath(input_path):
+        raise ValueError(f"{store_path} was built from {source['source']}, not {input_path}")
+    if os.path.getsize(input_path) < source["offset"]:
+        raise ValueError(f"{input_path} is shorter than when it was ingested; reconvert the store")
+
+    store = EmbeddingStore(store_path)
+    rows = source.get("rows", len(store))
+    if len(store) < rows:
+        raise ValueError(f"{store_path} has {len(store)} rows but {source_path} records {rows}; reconvert the store")
+    if len(store) > rows:
+        store.truncate(rows)
+    offset = source["offset"]
+    with open(input_path, "rb") as infile:
+        first_line = source.get("lines")
+        if first_line is None:
+            # Stores built before line numbers were tracked; count the lines already ingested once
+            first_line = infile.read(offset).count(b"\n")
+        infile.seek(offset)
+
+        def checkpoint(consumed, lines):
+            _save_source(store_path, input_path, offset + consumed, first_line + lines, len(store))
+
+        written, skipped, consumed, lines = _append_lines(store, infile, batch_rows, first_line, checkpoint)
+    checkpoint(consumed, lines)
+    return written, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Binary, memory-mapped embedding store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    convert = subparsers.add_parser("convert", help="convert an embeddings JSONL file into a store")
+    convert.add_argument("input", nargs="?", default=_public_path("embeddings.jsonl"))
+    convert.add_argument("output", nargs="?", default=_public_path("embeddings.f32"))
+    update = subparsers.add_parser("update", help="append embeddings added to the JSONL file since the last run")
+    update.add_argument("input", nargs="?", default=_public_path("embeddings.jsonl"))
+    update.add_argument("output", nargs="?", default=_public_path("embeddings.f32"))
+    info = subparsers.add_parser("info", help="print the size of a store")
+    info.add_argument("store", nargs="?", default=_public_path("embeddings.f32"))
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        if os.path.exists(args.output):
+            parser.error(f"{args.output} already exists; remove it first to reconvert, or use update")
+        written, skipped = convert_jsonl(args.input, args.output)
+        print(f"Wrote {written} embeddings to {args.output} ({skipped} lines skipped)")
+    elif args.command == "update":
+        try:
+            written, skipped = update_jsonl(args.input, args.output)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Appended {written} embeddings to {args.output} ({skipped} lines skipped)")
+    else:
+        store = EmbeddingStore(args.store)
+        print(f"{args.store}: {len(store)} rows x {store.dim} dims ({DTYPE.name})")
@@ -1,5 +1,24 @@
 import os
 
+def to_json_array(stripped_line):
+    """Normalizes one embedding line to a JSON array string.
+       Handles `[...]` (returned as is), `{[...]}` (the braces are dropped) and bare
+       comma-separated numbers (wrapped in brackets). Returns None for a `{...}` line
+       whose content isn't an array.
+    """
+    # Check if it already looks like a JSON array
+    if stripped_line.startswith('[') and stripped_line.endswith(']'):
+        return stripped_line
+    # Check if it looks like the invalid { [...] } format
+    if stripped_line.startswith('{') and stripped_line.endswith('}'):
+        # Extract content within {} and assume it's a valid array string
+        content = stripped_line[1:-1].strip()
+        if content.startswith('[') and content.endswith(']'):
+            return content
+        return None
+    # Assume it's the comma-separated format without brackets
+    return f'[{stripped_line}]'
+
 def fix_embeddings_format(input_filename="embeddings.jsonl", output_filename="embeddings_fixed.jsonl"):
     """Reads an input file containing lines of comma-separated numbers,
        wraps each line in square brackets to form valid JSON arrays,
@@ -20,21 +39,12 @@ def fix_embeddings_format(input_filename="embeddings.jsonl", output_filename="em
             for line in infile:
                 stripped_line = line.strip()
                 if stripped_line:
-                    # Check if it already looks like a JSON array
-                    if stripped_line.startswith('[') and stripped_line.endswith(']'):
-                        outfile.write(stripped_line + '\n') # Write as is
-                    # Check if it looks like the invalid { [...] } format
-                    elif stripped_line.startswith('{') and stripped_line.endswith('}'):
-                         # Extract content within {} and assume it's a valid array string
-                         content = stripped_line[1:-1].strip()
-                         if content.startswith('[') and content.endswith(']'):
-                             outfile.write(content + '\n')
-                         else:
-                             print(f"Warning: Skipping line with unexpected format inside {{}}: {stripped_line}")
-                             lines_skipped += 1
-                    # Assume it's the comma-separated format without brackets
+                    array_text = to_json_array(stripped_line)
+                    if array_text is not None:
+                        outfile.write(array_text + '\n')
                     else:
-                         outfile.write(f'[{stripped_line}]\n')
+                        print(f"Warning: Skipping line with unexpected format inside {{}}: {stripped_line}")
+                        lines_skipped += 1
                     lines_processed += 1
                 else:
                      lines_skipped += 1 # Skip empty lines
@@ -0,0 +1,301 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import numpy as np
+
+DIRECTIONS = ["LEFT", "RIGHT", "UP", "DOWN"]
+CSV_COLUMNS = ["type", "similarity_overall", "left", "right", "up", "down",
+               "left_percentage", "right_percentage", "up_percentage", "down_percentage"]
+HEAD_BYTES = 256
+# The strategy analyze_responses.js compares dry runs against
+DRY_RUN_STRATEGY = "Keep the highest valued tile in the top left corner."
+EMBEDDING_MODEL = "text-embedding-3-small"
+EMBEDDING_BATCH = 256
+# stats.json lists only the most recent scores; every score is in similarity_scores.jsonl
+RECENT_SCORES = 1000
+
+
+def _logs_path(filename):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, "..", "server", "logs", filename))
+
+
+def _head_digest(path, length):
+    """Hashes the start of the log so a cleared-and-refilled log isn't mistaken for an appended one."""
+    with open(path, "rb") as f:
+        return hashlib.blake2b(f.read(min(length, HEAD_BYTES)), digest_size=16).hexdigest()
+
+
+def empty_state():
+    return {
+        "offset": 0,
+        "head_digest": hashlib.blake2b(b"", digest_size=16).hexdigest(),
+        "userPrompt": "",
+        "totalEntries": 0,
+        "directionCounts": {},
+        "similaritySums": {},
+        "similarityCounts": {},
+        "adherenceSums": {},
+        "adherenceCounts": {},
+        "recentScores": [],
+        "badRecords": 0,
+    }
+
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return empty_state()
+    with open(state_path, "r") as f:
+        return json.load(f)
+
+
+def save_state(state_path, state):
+    tmp_path = state_path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+
+def read_new_entries(log_path, offset):
+    """Parses the JSON objects appended after `offset`, including pretty-printed multi-line ones.
+       Returns (entries, new_offset, bad records). An object that is still being written is
+       left for the next call; a malformed one is skipped (and counted) once a later object
+       starts after it, so it can't stall the offset.
+    """
+    with open(log_path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    text = data.decode("utf-8", errors="replace")
+
+    decoder = json.JSONDecoder()
+    entries = []
+    pos = bad = 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            break
+        try:
+            entry, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            # Loggers start every top-level object on a new line
+            next_start = text.find("\n{", pos)
+            if next_start < 0:
+                break
+            bad += 1
+            pos = next_start + 1
+            continue
+        entries.append(entry)
+        pos = end
+    return entries, offset + len(text[:pos].encode("utf-8", errors="replace")), bad
+
+
+def embed_texts(texts, base_url=None, model=EMBEDDING_MODEL):
+    """Embeds texts through an OpenAI-compatible /embeddings endpoint, EMBEDDING_BASE_URL by default
+       (the OCR server's caching proxy), in batches. Returns a float32 (n, dim) array.
+    """
+    base_url = (base_url or os.environ.get("EMBEDDING_BASE_URL") or "http://localhost:8000/v1").rstrip("/")
+    headers = {"Content-Type": "application/json"}
+    if os.environ.get("OPENAI_API_KEY"):
+        headers["Authorization"] = f"Bearer {os.environ['OPENAI_API_KEY']}"
+    vectors = []
+    for start in range(0, len(texts), EMBEDDING_BATCH):
+        body = json.dumps({"model": model, "input": texts[start:start + EMBEDDING_BATCH],
+                           "encoding_format": "float"}).encode("utf-8")
+        request = urllib.request.Request(f"{base_url}/embeddings", data=body, headers=headers, method="POST")
+        with urllib.request.urlopen(request, timeout=120) as response:
+            data = sorted(json.load(response)["data"], key=lambda item: item["index"])
+        vectors.extend(item["embedding"] for item in data)
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def reasoning_similarities(entries, strategy, embed=embed_texts):
+    """Cosine similarity between each entry's reasoning and the strategy, as analyze_responses.js
+       computes it. Returns a list aligned with `entries`; None where there is nothing to compare.
+    """
+    similarities = [None] * len(entries)
+    scored = [i for i, entry in enumerate(entries)
+              if isinstance(entry, dict) and entry.get("direction") not in (None, "", "USER STRATEGY")
+              and isinstance(entry.get("reasoning"), str) and entry["reasoning"].strip()]
+    if not strategy.strip() or not scored:
+        return similarities
+    vectors = embed([strategy.strip()] + [entries[i]["reasoning"].strip() for i in scored])
+    norms = np.linalg.norm(vectors, axis=1)
+    norms[norms == 0] = 1.0
+    cosines = (vectors[1:] @ vectors[0]) / (norms[1:] * norms[0])
+    for i, cosine in zip(scored, cosines.tolist()):
+        similarities[i] = cosine
+    return similarities
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def fold_entries(state, entries, similarities, scores_file=None):
+    """Updates the running aggregates with new entries, in O(len(entries)).
+       `similarities` holds each entry's reasoning-vs-strategy score (or None). New scores are
+       appended to `scores_file`; the logged `adherence` field is aggregated separately.
+    """
+    for entry, similarity in zip(entries, similarities):
+        if not isinstance(entry, dict):
+            continue
+        if state["totalEntries"] == 0:
+            state["userPrompt"] = entry.get("userPrompt") or ""
+        state["totalEntries"] += 1
+
+        direction = entry.get("direction")
+        if not direction or direction == "USER STRATEGY":
+            continue
+        state["directionCounts"][direction] = state["directionCounts"].get(direction, 0) + 1
+
+        adherence = _number(entry.get("adherence"))
+        if adherence is not None:
+            state["adherenceSums"][direction] = state["adherenceSums"].get(direction, 0.0) + adherence
+            state["adherenceCounts"][direction] = state["adherenceCounts"].get(direction, 0) + 1
+
+        if similarity is not None:
+            state["similaritySums"][direction] = state["similaritySums"].get(direction, 0.0) + similarity
+            state["similarityCounts"][direction] = state["similarityCounts"].get(direction, 0) + 1
+            score = {"timestamp": entry.get("timestamp"), "direction": direction, "similarity": round(similarity, 4)}
+            state["recentScores"].append(score)
+            if scores_file is not None:
+                scores_file.write(json.dumps(score) + "\n")
+    del state["recentScores"][:-RECENT_SCORES]
+
+
+def _averages(sums, counts):
+    total = sum(counts.values())
+    return {
+        "overallAverage": f"{sum(sums.values()) / total:.4f}" if total else 0,
+        "byDirection": {direction: f"{sums[direction] / count:.4f}" for direction, count in counts.items() if count},
+    }
+
+
+def build_stats(state, dry_run=False):
+    """Builds stats.json in the same shape analyze_responses.js writes."""
+    total = sum(state["directionCounts"].values())
+    return {
+        "userPrompt": state["userPrompt"],
+        "dryRun": dry_run,
+        "totalEntries": state["totalEntries"],
+        "directionCounts": state["directionCounts"],
+        "percentages": {
+            direction: f"{count / total * 100:.2f}" for direction, count in state["directionCounts"].items()
+        },
+        "similarityAnalysis": {
+            **_averages(state["similaritySums"], state["similarityCounts"]),
+            "similarityScores": state["recentScores"],
+        },
+        "adherenceAnalysis": _averages(state["adherenceSums"], state["adherenceCounts"]),
+        "badRecords": state["badRecords"],
+    }
+
+
+def update_data_csv(csv_path, run_type, stats):
+    """Replaces (or adds) this run's row in data.csv, the file visualization.py reads."""
+    rows = []
+    if os.path.exists(csv_path):
+        with open(csv_path, "r", newline="") as f:
+            reader = csv.DictReader(f, skipinitialspace=True)
+            rows = [{key.strip(): value for key, value in row.items() if key} for row in reader
+                    if row.get("type") != run_type]
+
+    similarity = stats["similarityAnalysis"]
+    row = {"type": run_type, "similarity_overall": float(similarity["overallAverage"]),
+           "adherence_overall": float(stats["adherenceAnalysis"]["overallAverage"])}
+    for direction in DIRECTIONS:
+        row[direction.lower()] = float(similarity["byDirection"].get(direction, 0))
+        row[f"{direction.lower()}_percentage"] = float(stats["percentages"].get(direction, 0))
+    rows.append(row)
+
+    columns = list(CSV_COLUMNS)
+    for existing in rows:
+        columns += [key for key in existing if key not in columns]
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def aggregate(run_type=None, dry_run=False, log_filename="model_directions.jsonl",
+              state_filename="aggregator_state.json", scores_filename="similarity_scores.jsonl",
+              similarity=True):
+    """Folds new log entries into the persisted aggregates and rewrites stats.json (and data.csv).
+       If the log was cleared or rewritten since the last run, aggregation starts over.
+       Similarities need embeddings (see `embed_texts`); when they can't be fetched nothing is
+       folded, so the entries are retried on the next run. Returns the number of new entries.
+    """
+    log_path = _logs_path(log_filename)
+    state_path = _logs_path(state_filename)
+    scores_path = _logs_path(scores_filename)
+    if not os.path.exists(log_path):
+        print(f"Error: Log file not found at {log_path}")
+        return 0
+
+    state = load_state(state_path)
+    if (os.path.getsize(log_path) < state["offset"]
+            or _head_digest(log_path, state["offset"]) != state["head_digest"]
+            or "recentScores" not in state):
+        print("Log was cleared or rewritten; starting a new aggregation.")
+        state = empty_state()
+        open(scores_path, "w").close()
+
+    entries, offset, bad = read_new_entries(log_path, state["offset"])
+    if bad:
+        print(f"Warning: Skipped {bad} malformed log records.")
+    if similarity:
+        if state["totalEntries"] == 0:
+            first = next((entry for entry in entries if isinstance(entry, dict)), {})
+            state["userPrompt"] = first.get("userPrompt") or ""
+        strategy = DRY_RUN_STRATEGY if dry_run else state["userPrompt"]
+        similarities = reasoning_similarities(entries, strategy)
+    else:
+        similarities = [None] * len(entries)
+
+    with open(scores_path, "a") as scores_file:
+        fold_entries(state, entries, similarities, scores_file)
+    state["offset"] = offset
+    state["badRecords"] += bad
+    state["head_digest"] = _head_digest(log_path, state["offset"])
+    save_state(state_path, state)
+
+    stats = build_stats(state, dry_run)
+    with open(_logs_path("stats.json"), "w") as f:
+        json.dump(stats, f, indent=2)
+    if run_type:
+        update_data_csv(_logs_path("data.csv"), run_type, stats)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally aggregate model_directions.jsonl into stats.json.")
+    parser.add_argument("--type", dest="run_type",
+                        help="row label in data.csv (e.g. dry, topLeft); data.csv is only updated when given")
+    parser.add_argument("--dry-run", action="store_true", help="mark the stats as a dry run")
+    parser.add_argument("--follow", type=float, metavar="SECONDS",
+                        help="keep tailing the log, polling every SECONDS")
+    parser.add_argument("--no-similarity", action="store_true",
+                        help="skip the reasoning-vs-strategy similarity (needs no embeddings)")
+    args = parser.parse_args()
+
+    while True:
+        try:
+            new_entries = aggregate(args.run_type, args.dry_run, similarity=not args.no_similarity)
+        except (urllib.error.URLError, TimeoutError) as e:
+            print(f"Error: Could not embed the new entries ({e}); nothing was folded. "
+                  f"Start the embedding proxy, set EMBEDDING_BASE_URL, or pass --no-similarity.")
+            if not args.follow:
+                sys.exit(1)
+        else:
+            print(f"Folded in {new_entries} new entries.")
+        if not args.follow:
+            break
+        time.sleep(args.follow)
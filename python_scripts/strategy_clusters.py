@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+
+import numpy as np
+
+from embedding_store import EmbeddingStore
+
+CHUNK_ROWS = 16384
+
+
+def _public_path(filename):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, "..", "server", "public", filename))
+
+
+def _rows(matrix, indices, normalize):
+    """Reads rows of a (memory-mapped) matrix as float32, optionally scaled to unit length."""
+    rows = np.asarray(matrix[np.sort(indices)], dtype=np.float32)
+    if normalize:
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        rows /= np.maximum(norms, 1e-12)
+    return rows
+
+
+def nearest_centroid(embeddings, centroids):
+    """Vectorized nearest-centroid lookup.
+       Returns (labels, squared distances) for an (n, d) array or a single (d,) embedding.
+    """
+    points = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    centroids = np.asarray(centroids, dtype=np.float32)
+    # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, as one matrix product
+    distances = ((points ** 2).sum(axis=1, keepdims=True) - 2 * points @ centroids.T
+                 + (centroids ** 2).sum(axis=1))
+    labels = distances.argmin(axis=1)
+    return labels, np.maximum(distances[np.arange(len(points)), labels], 0)
+
+
+def kmeans_plus_plus(sample, k, rng):
+    """Picks k initial centroids from `sample` with k-means++ seeding."""
+    centroids = [sample[rng.integers(len(sample))]]
+    closest = ((sample - centroids[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(sample), p=closest / total) if total > 0 else rng.integers(len(sample))
+        centroids.append(sample[index])
+        closest = np.minimum(closest, ((sample - sample[index]) ** 2).sum(axis=1))
+    return np.stack(centroids)
+
+
+def fit(matrix, k, batch_size=4096, max_iter=300, tol=1e-4, sample_size=20000, normalize=False, seed=0):
+    """Mini-batch k-means over a (possibly memory-mapped) (n, d) matrix.
+
+       Only one mini-batch (and the k-means++ seeding sample) is in memory at a time, so
+       the corpus can be far larger than RAM. Each centroid moves toward the mean of its
+       batch points with a per-centroid learning rate of (points in batch) / (points seen).
+       Stops after `max_iter` batches, or once the largest centroid move in a batch falls
+       below `tol` times the mean centroid norm. Returns (centroids, iterations).
+    """
+    n = len(matrix)
+    if n < k:
+        raise ValueError(f"Need at least {k} embeddings to form {k} clusters, found {n}")
+    rng = np.random.default_rng(seed)
+
+    sample = _rows(matrix, rng.choice(n, size=min(n, sample_size), replace=False), normalize)
+    centroids = kmeans_plus_plus(sample, k, rng)
+    del sample
+    seen = np.zeros(k, dtype=np.int64)
+
+    iterations = 0
+    for iterations in range(1, max_iter + 1):
+        batch = _rows(matrix, rng.choice(n, size=min(n, batch_size), replace=False), normalize)
+        labels, _ = nearest_centroid(batch, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, batch)
+
+        updated = counts > 0
+        seen += counts
+        step = (sums[updated] - counts[updated, None] * centroids[updated]) / seen[updated, None]
+        centroids[updated] += step
+        if normalize:
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+        scale = np.linalg.norm(centroids, axis=1).mean() or 1.0
+        if np.abs(step).max(initial=0) < tol * scale:
+            break
+    return centroids, iterations
+
+
+def assign(matrix, centroids, labels_path, distances_path, normalize=False, chunk_rows=CHUNK_ROWS):
+    """Labels every row in chunks, writing int32 labels and float32 squared distances to .npy files.
+       Returns (cluster sizes, inertia).
+    """
+    n = len(matrix)
+    labels_out = np.lib.format.open_memmap(labels_path, mode="w+", dtype=np.int32, shape=(n,))
+    distances_out = np.lib.format.open_memmap(distances_path, mode="w+", dtype=np.float32, shape=(n,))
+    sizes = np.zeros(len(centroids), dtype=np.int64)
+    inertia = 0.0
+    for start in range(0, n, chunk_rows):
+        rows = _rows(matrix, np.arange(start, min(n, start + chunk_rows)), normalize)
+        labels, distances = nearest_centroid(rows, centroids)
+        labels_out[start:start + len(rows)] = labels
+        distances_out[start:start + len(rows)] = distances
+        sizes += np.bincount(labels, minlength=len(centroids))
+        inertia += float(distances.sum(dtype=np.float64))
+    labels_out.flush()
+    distances_out.flush()
+    return sizes, inertia
+
+
+def load_centroids(output_dir):
+    """Loads the centroids written by `cluster_store`."""
+    return np.load(os.path.join(output_dir, "centroids.npy"))
+
+
+def cluster_store(store_path, output_dir, k=8, batch_size=4096, max_iter=300, normalize=False, seed=0):
+    """Clusters an EmbeddingStore and writes to `output_dir`:
+       - centroids.npy (k x d float32) and centroids.json (the same as nested lists)
+       - assignments.npy (cluster per row) and distances.npy (squared distance to it)
+       - clusters.json with the settings, cluster sizes and inertia
+    """
+    store = EmbeddingStore(store_path)
+    matrix = store.matrix()
+    os.makedirs(output_dir, exist_ok=True)
+
+    centroids, iterations = fit(matrix, k, batch_size, max_iter, normalize=normalize, seed=seed)
+    sizes, inertia = assign(matrix, centroids, os.path.join(output_dir, "assignments.npy"),
+                            os.path.join(output_dir, "distances.npy"), normalize)
+
+    np.save(os.path.join(output_dir, "centroids.npy"), centroids.astype(np.float32))
+    with open(os.path.join(output_dir, "centroids.json"), "w") as f:
+        json.dump(centroids.tolist(), f)
+    summary = {
+        "store": os.path.abspath(store_path),
+        "rows": len(matrix),
+        "dim": int(matrix.shape[1]),
+        "k": k,
+        "normalize": normalize,
+        "iterations": iterations,
+        "sizes": sizes.tolist(),
+        "inertia": inertia,
+    }
+    with open(os.path.join(output_dir, "clusters.json"), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mini-batch k-means strategy centroids over an embedding store.")
+    parser.add_argument("store", nargs="?", default=_public_path("embeddings.f32"),
+                        help="EmbeddingStore to cluster (see embedding_store.py convert)")
+    parser.add_argument("output_dir", nargs="?", default=_public_path("clusters"))
+    parser.add_argument("--k", type=int, default=8, help="number of clusters")
+    parser.add_argument("--batch-size", type=int, default=4096)
+    parser.add_argument("--max-iter", type=int, default=300, help="maximum number of mini-batches")
+    parser.add_argument("--normalize", action="store_true", help="cluster unit-length embeddings (cosine geometry)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    summary = cluster_store(args.store, args.output_dir, args.k, args.batch_size, args.max_iter, args.normalize,
+                            args.seed)
+    print(f"Clustered {summary['rows']} embeddings into {summary['k']} clusters in {summary['iterations']} "
+          f"batches; sizes {summary['sizes']}, inertia {summary['inertia']:.4f}. Wrote {args.output_dir}")
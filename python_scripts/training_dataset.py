@@ -0,0 +1,253 @@
+import argparse
+import json
+import os
+import sys
+
+import cv2
+import numpy as np
+
+from embedding_store import EmbeddingStore
+from log_aggregator import read_new_entries
+
+DIRECTIONS = ["LEFT", "RIGHT", "UP", "DOWN"]
+NO_LABEL = 255
+INDEX_FILENAME = "index.json"
+FORMAT_VERSION = 1
+OCR_SERVER_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ocr_server"))
+
+
+def _server_path(*parts):
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.normpath(os.path.join(script_dir, "..", "server", *parts))
+
+
+def board_exponents(board) -> np.ndarray:
+    """Converts a 4x4 board of tile values (0, 2, 4, ...) to int8 log2 exponents, 0 for empty cells."""
+    values = np.asarray(board, dtype=np.int64).reshape(4, 4)
+    exponents = np.zeros((4, 4), dtype=np.int8)
+    occupied = values > 0
+    exponents[occupied] = np.log2(values[occupied]).round().astype(np.int8)
+    return exponents
+
+
+class DatasetWriter:
+    """Streams aligned (frame, board, move, embedding) records into fixed-size shards.
+
+       Every shard is a set of .npy arrays sharing a row order:
+       - frames: uint8 (n, size, size, 3) downscaled RGB board crops
+       - boards: int8 (n, 4, 4) log2 tile exponents
+       - labels: uint8 (n,) index into DIRECTIONS, or 255 when unknown
+       - embeddings: float32 (n, dim), when the dataset has embeddings
+       plus a meta.jsonl line per row with its source. index.json lists the shards and
+       their row counts, and is rewritten after each shard so a partial dataset is readable.
+    """
+
+    def __init__(self, path, shard_size=4096, frame_size=64, embedding_dim=0):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        if os.path.exists(os.path.join(path, INDEX_FILENAME)):
+            raise ValueError(f"{path} already contains a dataset")
+        self.shard_size = shard_size
+        self.frame_size = frame_size
+        self.embedding_dim = embedding_dim
+        self.shards = []
+        self._frames = np.zeros((shard_size, frame_size, frame_size, 3), dtype=np.uint8)
+        self._boards = np.zeros((shard_size, 4, 4), dtype=np.int8)
+        self._labels = np.full(shard_size, NO_LABEL, dtype=np.uint8)
+        self._embeddings = np.zeros((shard_size, embedding_dim), dtype=np.float32)
+        self._meta = []
+
+    def add(self, frame=None, board=None, direction=None, embedding=None, meta=None):
+        """Appends one record. `frame` is an RGB crop of any size; missing parts are left as zeros."""
+        row = len(self._meta)
+        if frame is not None:
+            self._frames[row] = cv2.resize(np.asarray(frame, dtype=np.uint8), (self.frame_size, self.frame_size),
+                                           interpolation=cv2.INTER_AREA)
+        else:
+            self._frames[row] = 0
+        self._boards[row] = board_exponents(board) if board is not None else 0
+        self._labels[row] = DIRECTIONS.index(direction) if direction in DIRECTIONS else NO_LABEL
+        if self.embedding_dim:
+            self._embeddings[row] = embedding if embedding is not None else 0
+        self._meta.append(meta or {})
+        if len(self._meta) == self.shard_size:
+            self.flush()
+
+    def flush(self):
+        """Writes the buffered records as a new shard."""
+        count = len(self._meta)
+        if not count:
+            return
+        name = f"shard-{len(self.shards):05d}"
+        np.save(os.path.join(self.path, f"{name}.frames.npy"), self._frames[:count])
+        np.save(os.path.join(self.path, f"{name}.boards.npy"), self._boards[:count])
+        np.save(os.path.join(self.path, f"{name}.labels.npy"), self._labels[:count])
+        if self.embedding_dim:
+            np.save(os.path.join(self.path, f"{name}.embeddings.npy"), self._embeddings[:count])
+        with open(os.path.join(self.path, f"{name}.meta.jsonl"), "w") as f:
+            for meta in self._meta:
+                f.write(json.dumps(meta) + "\n")
+        self.shards.append({"name": name, "count": count})
+        self._meta = []
+        self._write_index()
+
+    def _write_index(self):
+        index = {
+            "version": FORMAT_VERSION,
+            "directions": DIRECTIONS,
+            "shard_size": self.shard_size,
+            "frame_size": self.frame_size,
+            "embedding_dim": self.embedding_dim,
+            "total": sum(shard["count"] for shard in self.shards),
+            "shards": self.shards,
+        }
+        tmp_path = os.path.join(self.path, INDEX_FILENAME + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, os.path.join(self.path, INDEX_FILENAME))
+
+    def close(self):
+        self.flush()
+        if not self.shards:
+            self._write_index()
+
+
+class TrainingDataset:
+    """Memory-mapped reader for a dataset written by DatasetWriter.
+
+       Shards are opened lazily with np.load(mmap_mode="r"), so only rows that are
+       actually read are paged in. Supports len(), random access by global row and
+       shuffled mini-batch iteration.
+    """
+
+    FIELDS = ("frames", "boards", "labels", "embeddings")
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_FILENAME), "r") as f:
+            self.index = json.load(f)
+        if self.index["version"] != FORMAT_VERSION:
+            raise ValueError(f"{path} is a version {self.index['version']} dataset, expected {FORMAT_VERSION}")
+        self.shards = self.index["shards"]
+        self.offsets = np.cumsum([0] + [shard["count"] for shard in self.shards])
+        self.fields = [field for field in self.FIELDS if field != "embeddings" or self.index["embedding_dim"]]
+        self._arrays = {}
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def shard(self, number):
+        """The memory-mapped arrays of one shard, as a dict keyed by field."""
+        if number not in self._arrays:
+            name = self.shards[number]["name"]
+            self._arrays[number] = {
+                field: np.load(os.path.join(self.path, f"{name}.{field}.npy"), mmap_mode="r") for field in self.fields
+            }
+        return self._arrays[number]
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        number = int(np.searchsorted(self.offsets, row, side="right")) - 1
+        arrays = self.shard(number)
+        return {field: np.asarray(arrays[field][row - self.offsets[number]]) for field in self.fields}
+
+    def batches(self, batch_size=256, shuffle=True, seed=None):
+        """Yields dicts of stacked arrays.
+
+           With `shuffle`, shards are visited in random order and rows are shuffled within
+           each shard, which keeps reads local to one memory map at a time. Each batch's rows
+           are read in ascending order for sequential access.
+        """
+        rng = np.random.default_rng(seed)
+        order = rng.permutation(len(self.shards)) if shuffle else range(len(self.shards))
+        for number in order:
+            arrays = self.shard(int(number))
+            count = self.shards[int(number)]["count"]
+            rows = rng.permutation(count) if shuffle else np.arange(count)
+            for start in range(0, count, batch_size):
+                batch_rows = np.sort(rows[start:start + batch_size])
+                yield {field: arrays[field][batch_rows] for field in self.fields}
+
+
+def _crop_board(screenshot_path):
+    """Reads a screenshot and returns its RGB board crop, using the OCR server's board detection."""
+    if OCR_SERVER_DIR not in sys.path:
+        sys.path.insert(0, OCR_SERVER_DIR)
+    from ocr_api import load_and_crop_board_from_array
+
+    img_array = cv2.imread(screenshot_path)
+    if img_array is None:
+        raise ValueError(f"Could not read {screenshot_path}")
+    return np.asarray(load_and_crop_board_from_array(img_array))
+
+
+def build_from_logs(output_path, log_path=None, screencaps_dir=None, embeddings_path=None,
+                    shard_size=4096, frame_size=64):
+    """Builds a dataset from the logged decisions in model_directions.jsonl.
+
+       Each logged move carrying a `board` becomes a record. Its frame is the board crop of
+       the `screenshot` it names in screencaps, when that file exists. Embeddings come from an
+       EmbeddingStore converted from embeddings.jsonl: a move's `embedding_line` is joined to the
+       store row converted from that line, and moves without one get a zero embedding.
+       Returns (records written, moves skipped).
+    """
+    log_path = log_path or _server_path("logs", "model_directions.jsonl")
+    screencaps_dir = screencaps_dir or _server_path("public", "screencaps")
+    entries, _, _ = read_new_entries(log_path, 0)
+    moves = [entry for entry in entries if isinstance(entry, dict) and entry.get("direction") in DIRECTIONS]
+
+    embeddings, rows_by_line = None, {}
+    if embeddings_path:
+        store = EmbeddingStore(embeddings_path)
+        embeddings = store.matrix()
+        rows_by_line = {entry["line"]: entry["row"] for entry in store.index() if entry.get("line") is not None}
+
+    writer = DatasetWriter(output_path, shard_size, frame_size, embeddings.shape[1] if embeddings is not None else 0)
+    written = skipped = 0
+    for entry in moves:
+        if entry.get("board") is None:
+            skipped += 1
+            continue
+        frame = None
+        if entry.get("screenshot"):
+            screenshot_path = os.path.join(screencaps_dir, entry["screenshot"])
+            try:
+                frame = _crop_board(screenshot_path)
+            except ValueError as e:
+                print(f"Warning: No frame for {entry['screenshot']}: {e}")
+        row = rows_by_line.get(entry.get("embedding_line"))
+        writer.add(frame, entry["board"], entry["direction"], embeddings[row] if row is not None else None,
+                   {"timestamp": entry.get("timestamp"), "screenshot": entry.get("screenshot"), "embedding_row": row})
+        written += 1
+    writer.close()
+    return written, skipped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded (frame, board, move, embedding) training datasets.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help="build a dataset from model_directions.jsonl and screencaps")
+    build.add_argument("output", help="dataset directory to create")
+    build.add_argument("--log", help="decision log (default: server/logs/model_directions.jsonl)")
+    build.add_argument("--screencaps", help="screenshot directory (default: server/public/screencaps)")
+    build.add_argument("--embeddings", help="EmbeddingStore converted from embeddings.jsonl")
+    build.add_argument("--shard-size", type=int, default=4096)
+    build.add_argument("--frame-size", type=int, default=64, help="side of the downscaled board crops")
+    info = subparsers.add_parser("info", help="print a dataset's size and label counts")
+    info.add_argument("dataset")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        written, skipped = build_from_logs(args.output, args.log, args.screencaps, args.embeddings,
+                                           args.shard_size, args.frame_size)
+        print(f"Wrote {written} records to {args.output} ({skipped} logged moves had no board)")
+    else:
+        dataset = TrainingDataset(args.dataset)
+        counts = np.zeros(len(DIRECTIONS) + 1, dtype=np.int64)
+        for number in range(len(dataset.shards)):
+            labels = np.asarray(dataset.shard(number)["labels"])
+            counts += np.bincount(np.minimum(labels, len(DIRECTIONS)), minlength=len(DIRECTIONS) + 1)
+        print(f"{args.dataset}: {len(dataset)} records in {len(dataset.shards)} shards, "
+              f"{dataset.index['frame_size']}px frames, {dataset.index['embedding_dim']}-d embeddings")
+        print(", ".join(f"{name}: {count}" for name, count in zip(DIRECTIONS + ["unlabeled"], counts)))
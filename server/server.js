@@ -34,6 +34,40 @@ const getAdbPath = () => {
 
 const gameAnalyzer = new GameAnalyzer();
 
+/**
+ * Create a reserver of numbered filenames (`<prefix>N.<extension>`) in one directory.
+ * The next free index is taken from the highest existing file once, so deleted files
+ * never cause an older one to be overwritten.
+ * @param {string} prefix - The filename prefix, e.g. "screenshot"
+ * @returns {function(string, string): Promise<{filename: string, count: number}>}
+ */
+function createFilenameReserver(prefix) {
+  let nextIndex = null;
+  const pattern = new RegExp(`^${prefix}(\\d+)\\.`);
+  return async (dir, extension) => {
+    if (nextIndex === null) {
+      await fs.mkdir(dir, { recursive: true });
+      const files = await fs.readdir(dir);
+      const indices = files
+        .map((file) => pattern.exec(file))
+        .filter(Boolean)
+        .map((match) => parseInt(match[1], 10));
+      // Another request may have reserved an index while the directory was read
+      nextIndex = Math.max(
+        nextIndex ?? 0,
+        indices.length ? Math.max(...indices) + 1 : 0
+      );
+    }
+    const count = nextIndex++;
+    return { filename: `${prefix}${count}.${extension}`, count };
+  };
+}
+
+// User captures in screencaps; their count is reported as X-Screenshot-Count
+const nextScreenshotFilename = createFilenameReserver("screenshot");
+// Frames sent to OCR by /api/analyze, kept apart so they don't change the capture count
+const nextAnalyzedFrameFilename = createFilenameReserver("frame");
+
 app.use(cors());
 app.use(express.json());
 app.use(express.static(path.join(__dirname, "../client/public")));
@@ -70,11 +104,21 @@ app.post("/api/analyze", async (req, res) => {
       .jpeg({ quality: 80 })
       .toBuffer();
 
+    // Keep the exact frame that is OCR'd, so logged boards can be paired with it;
+    // saved while the analysis runs
+    const framesDir = path.join(__dirname, "public", "screencaps", "analyzed");
+    const { filename } = await nextAnalyzedFrameFilename(framesDir, "jpg");
+    fs.writeFile(path.join(framesDir, filename), screenshotBuffer).catch(
+      console.error
+    );
+
     // Use the game analyzer to analyze the game state
     const analysisJson = await gameAnalyzer.analyzeGameState(
       req.body.userPrompt,
       screenshotBuffer
     );
+    // Relative to screencaps
+    analysisJson.screenshot = `analyzed/${filename}`;
 
     res.json(analysisJson);
   } catch (error) {
@@ -85,10 +129,12 @@ app.post("/api/analyze", async (req, res) => {
 
 app.post("/api/screenshot/capture", async (req, res) => {
   try {
-    // Get count first since we need it for comparison
+    // Reserve the filename first since we need the count for comparison
     const screencapsDir = path.join(__dirname, "public", "screencaps");
-    const files = await fs.readdir(screencapsDir);
-    const currentCount = files.length;
+    const { filename, count: currentCount } = await nextScreenshotFilename(
+      screencapsDir,
+      "png"
+    );
 
     // Use exec-out to get PNG data directly
     const { stdout } = await execFileAsync(
@@ -100,7 +146,6 @@ app.post("/api/screenshot/capture", async (req, res) => {
     const screenshotBuffer = stdout;
 
     // Save file asynchronously
-    const filename = `screenshot${currentCount}.png`;
     fs.writeFile(path.join(screencapsDir, filename), screenshotBuffer).catch(
       console.error
     );
@@ -181,9 +226,12 @@ app.get("/api/dimensions", async (req, res) => {
 app.delete("/api/screencaps", async (req, res) => {
   try {
     const imagePath = path.join(__dirname, "public/screencaps");
-    const files = await fs.readdir(imagePath);
+    // Only user captures; the analyzed/ frames back the move log
+    const files = await fs.readdir(imagePath, { withFileTypes: true });
     await Promise.all(
-      files.map((file) => fs.unlink(path.join(imagePath, file)))
+      files
+        .filter((file) => file.isFile())
+        .map((file) => fs.unlink(path.join(imagePath, file.name)))
     );
     res.json({ success: true, count: 0 });
   } catch (error) {
@@ -212,7 +260,16 @@ app.post("/api/model/", (req, res) => {
 // Endpoint to log model output directions to a file
 app.post("/api/log-direction", async (req, res) => {
   try {
-    const { direction, reasoning, timestamp, userPrompt } = req.body;
+    const {
+      direction,
+      reasoning,
+      timestamp,
+      userPrompt,
+      adherence,
+      board,
+      screenshot,
+      embeddingLine,
+    } = req.body;
 
     // Create logs directory if it doesn't exist
     const logsDir = path.join(__dirname, "logs");
@@ -233,6 +290,10 @@ app.post("/api/log-direction", async (req, res) => {
         reasoning,
         timestamp,
         userPrompt: validUserPrompt,
+        adherence,
+        board,
+        screenshot,
+        embedding_line: embeddingLine,
       },
       null,
       2
@@ -7,7 +7,13 @@ const { OpenAI } = require("openai");
 // Initialize OpenAI client with fallback for missing API key
 let openai = null;
 try {
-  openai = new OpenAI(process.env.OPENAI_API_KEY);
+  // EMBEDDING_BASE_URL points at the OCR server's caching proxy, e.g. "http://localhost:8000/v1"
+  openai = process.env.EMBEDDING_BASE_URL
+    ? new OpenAI({
+        apiKey: process.env.OPENAI_API_KEY || "local",
+        baseURL: process.env.EMBEDDING_BASE_URL,
+      })
+    : new OpenAI(process.env.OPENAI_API_KEY);
 } catch (error) {
   console.warn(
     "OpenAI client initialization failed. Embeddings will not be available:",
@@ -24,9 +24,12 @@ class GameAnalyzer {
     this.previousScreenshotBuffer = null;
     this.currentScreenshotBuffer = null;
     this.stuckMoveCount = 0; // Count consecutive times the screen hasn't changed
+    // OCR session id: lets the OCR server diff each frame against this device's previous one
+    this.ocrDeviceId = process.env.OCR_DEVICE_ID || `node-${process.pid}`;
     this.moveCounter = 0;
     this.gameScore = 0;
     this.embeddings = [];
+    this.embeddingLines = null; // Lines in embeddings.jsonl, counted on first append
     this.moveHistory = [];
   }
 
@@ -65,7 +68,10 @@ class GameAnalyzer {
    */
   async _getBoardState(screenshotBuffer) {
     await this.processScreenshot(screenshotBuffer);
-    const board = await this.analyzeWithOCR(screenshotBuffer);
+    // Legal moves are kept out of the board object so the prompt is unchanged
+    const { legal_moves: legalMoves, ...board } = await this.analyzeWithOCR(
+      screenshotBuffer
+    );
 
     let messages = [];
 
@@ -106,7 +112,7 @@ class GameAnalyzer {
       this.stuckMoveCount = 0;
     }
 
-    return { board, messages };
+    return { board, legalMoves, messages };
   }
 
   /**
@@ -179,30 +185,36 @@ class GameAnalyzer {
     }
   }
 
+  /**
+   * Append an embedding to embeddings.jsonl
+   * @param {number[]} embedding - The embedding vector
+   * @returns {number} The 0-based line it was written to, which embedding_store.py keeps as the row's `line`
+   */
+  _appendEmbedding(embedding) {
+    const embeddingsPath = path.join(__dirname, "..", "public", "embeddings.jsonl");
+    if (this.embeddingLines === null) {
+      this.embeddingLines = fs.existsSync(embeddingsPath)
+        ? fs.readFileSync(embeddingsPath, "utf-8").split("\n").length - 1
+        : 0;
+    }
+    fs.appendFileSync(embeddingsPath, JSON.stringify(embedding) + "\n");
+    return this.embeddingLines++;
+  }
+
   async _determineAdherance(response, userPrompt) {
     let adherance = 0;
+    this.lastEmbeddingLine = null;
+    // The parsed model result carries its explanation in `reasoning`
+    const responseText = response.reasoning;
     if (userPrompt == "") {
-      const embedding = await generateEmbedding(response.text);
+      const embedding = await generateEmbedding(responseText);
       console.log("Embedding generated.");
       if (embedding) {
         this.embeddings.push(embedding);
-        if (
-          !fs.existsSync(
-            path.join(__dirname, "..", "public", "embeddings.jsonl")
-          )
-        ) {
-          fs.writeFileSync(
-            path.join(__dirname, "..", "public", "embeddings.jsonl"),
-            ""
-          );
-        }
-        fs.appendFileSync(
-          path.join(__dirname, "..", "public", "embeddings.jsonl"),
-          JSON.stringify(embedding) + "\n"
-        );
+        this.lastEmbeddingLine = this._appendEmbedding(embedding);
       }
     } else {
-      const response_embedding = await generateEmbedding(response.text);
+      const response_embedding = await generateEmbedding(responseText);
       const prompt_embedding = await generateEmbedding(userPrompt);
       const centroid = JSON.parse(
         fs.readFileSync(
@@ -234,15 +246,24 @@ class GameAnalyzer {
   async analyzeGameState(userPrompt, screenshotBuffer) {
     try {
       const activeMove = { direction: null, board: null, reasoning: null };
-      const { board, messages } = await this._getBoardState(screenshotBuffer);
+      const { board, legalMoves, messages } = await this._getBoardState(
+        screenshotBuffer
+      );
 
       activeMove.board = board;
 
       this._buildPrompt(messages, userPrompt, board);
 
-      // Call the model API
-      let result;
-      if (this.modelProvider instanceof OpenAI) {
+      // Reuse a cached decision for this position and strategy, if enabled.
+      // Skipped while stuck: the cached move may be the one that isn't working,
+      // and moves made under the stuck instructions don't follow the plain strategy.
+      const stuck = this.stuckMoveCount > 0;
+      let result = stuck
+        ? null
+        : await this._lookupDecision(board, userPrompt, legalMoves);
+      if (result) {
+        console.log("Using cached decision: ", result.direction);
+      } else if (this.modelProvider instanceof OpenAI) {
         console.log("Using OpenAI model: ", localStorage.getItem("model"));
         const chat_completion =
           await this.modelProvider.chat.completions.create({
@@ -266,6 +287,9 @@ class GameAnalyzer {
           )
         );
       }
+      if (!result.cached && !stuck) {
+        await this._storeDecision(board, userPrompt, result);
+      }
 
       this.gameScore = result.gameScore;
       activeMove.direction = result.direction;
@@ -273,6 +297,8 @@ class GameAnalyzer {
       this.moveHistory.push(activeMove);
 
       result.adherence = await this._determineAdherance(result, userPrompt);
+      result.board = board.board;
+      result.embeddingLine = this.lastEmbeddingLine;
 
       return result;
     } catch (error) {
@@ -281,10 +307,70 @@ class GameAnalyzer {
     }
   }
 
+  /**
+   * Look up a previous decision for the same board (up to rotation and reflection),
+   * strategy and model in the OCR server's decision cache
+   * @param {Object} board - The board state from OCR
+   * @param {string} userPrompt - The user's strategy for playing the game
+   * @param {string[]} [legalMoves] - Directions that change the board; other cached directions are misses
+   * @returns {Object|null} The cached result, or null on a miss or when the cache is disabled
+   */
+  async _lookupDecision(board, userPrompt, legalMoves) {
+    if (process.env.DECISION_CACHE !== "true") return null;
+    try {
+      const response = await axios.post("http://localhost:8000/decisions/lookup", {
+        board: board.board,
+        prompt: userPrompt || "",
+        model: localStorage.getItem("model"),
+      });
+      if (!response.data.hit) return null;
+      if (
+        Array.isArray(legalMoves) &&
+        !legalMoves.includes(response.data.direction)
+      ) {
+        console.log(
+          "Ignoring cached decision that doesn't move the board:",
+          response.data.direction
+        );
+        return null;
+      }
+      return {
+        direction: response.data.direction,
+        reasoning: response.data.reasoning,
+        gameScore: this.gameScore,
+        cached: true,
+      };
+    } catch (error) {
+      console.error("Decision cache lookup failed:", error.message);
+      return null;
+    }
+  }
+
+  /**
+   * Store the model's decision in the OCR server's decision cache
+   * @param {Object} board - The board state from OCR
+   * @param {string} userPrompt - The user's strategy for playing the game
+   * @param {Object} result - The model's direction and reasoning
+   */
+  async _storeDecision(board, userPrompt, result) {
+    if (process.env.DECISION_CACHE !== "true") return;
+    try {
+      await axios.post("http://localhost:8000/decisions/insert", {
+        board: board.board,
+        prompt: userPrompt || "",
+        model: localStorage.getItem("model"),
+        direction: result.direction,
+        reasoning: result.reasoning,
+      });
+    } catch (error) {
+      console.error("Decision cache insert failed:", error.message);
+    }
+  }
+
   /**
    * Analyze a game screenshot with OCR
    * @param {Buffer} screenshotBuffer - The screenshot buffer of the current game state
-   * @returns {Object} The OCR result
+   * @returns {Object} The OCR result: the board and its legal moves
    */
   async analyzeWithOCR(screenshotBuffer) {
     const formData = new FormData();
@@ -296,8 +382,13 @@ class GameAnalyzer {
       headers: {
         "Content-Type": "multipart/form-data",
       },
+      params: { device_id: this.ocrDeviceId },
     });
-    return ocrResult.data;
+    // Per-tile engine details stay server-side
+    return {
+      board: ocrResult.data.board,
+      legal_moves: ocrResult.data.legal_moves,
+    };
   }
 
   /**